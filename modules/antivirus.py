@@ -1,40 +1,325 @@
+import contextlib
 import subprocess
 import os
+import shutil
+import socket
+import struct
+import threading
+import time
 import logging
+from collections import OrderedDict
 
 # Initialize logging for the antivirus module
 logger = logging.getLogger("Orchestrator.Antivirus")
 logger.debug("Antivirus scanning module initialized")
 
-def scan_file(filepath, config):
-    logger = logging.getLogger("Orchestrator.Antivirus")
+CLAMD_CHUNK_SIZE = 64 * 1024
+SCAN_CACHE_SIZE = 10_000
+# Seconds a clean verdict is reused. Kept short so a file left in the watch
+# directory is scanned again with the signatures freshclam fetched meanwhile.
+SCAN_CACHE_TTL = 3600
+
+# (realpath, mtime_ns, size) -> monotonic time the file scanned clean, so the
+# repeated created/moved/closed events for one download are scanned once.
+# Kept in memory only, and each entry for at most SCAN_CACHE_TTL seconds.
+_scan_cache = OrderedDict()
+_scan_cache_lock = threading.Lock()
+
+# Bounds the scans running at once across all worker pools, whether by
+# scan_file, scan_file_async or scan_stream_to_file
+# (virus_scanning.max_concurrent_scans); created on first use
+_scan_slots = None
+_scan_slots_lock = threading.Lock()
+
+def _scan_cache_key(filepath, st=None):
+    if st is None:
+        try:
+            st = os.stat(filepath)
+        except OSError:
+            return None
+    return os.path.realpath(filepath), st.st_mtime_ns, st.st_size
+
+def _cached_verdict(key):
+    if key is None:
+        return None
+    with _scan_cache_lock:
+        scanned = _scan_cache.get(key)
+        if scanned is None:
+            return None
+        if time.monotonic() - scanned >= SCAN_CACHE_TTL:
+            del _scan_cache[key]
+            return None
+        _scan_cache.move_to_end(key)
+        return "clean"
+
+def _remember_verdict(key, verdict):
+    # Only clean results are worth caching; infected files leave the watch dir
+    if key is None or verdict != "clean":
+        return
+    with _scan_cache_lock:
+        _scan_cache[key] = time.monotonic()
+        _scan_cache.move_to_end(key)
+        if len(_scan_cache) > SCAN_CACHE_SIZE:
+            _scan_cache.popitem(last=False)
+
+def _scan_slot(config):
+    """Return the semaphore limiting concurrent scans, or a no-op context if unlimited."""
+    global _scan_slots
+    limit = config['virus_scanning'].get('max_concurrent_scans')
+    if not limit:
+        return contextlib.nullcontext()
+    if _scan_slots is None:
+        with _scan_slots_lock:
+            if _scan_slots is None:
+                _scan_slots = threading.BoundedSemaphore(int(limit))
+    return _scan_slots
+
+@contextlib.asynccontextmanager
+async def _async_scan_slot(config):
+    """Async counterpart of `with _scan_slot(config)` for the coroutine scans."""
+    import asyncio
+    slot = _scan_slot(config)
+    if isinstance(slot, contextlib.nullcontext):
+        yield
+        return
+    if not slot.acquire(blocking=False):
+        # Wait in a worker thread so the event loop keeps serving other scans
+        waiter = asyncio.ensure_future(asyncio.to_thread(slot.acquire))
+        try:
+            await asyncio.shield(waiter)
+        except asyncio.CancelledError:
+            # The thread may still get the slot; give it straight back
+            waiter.add_done_callback(lambda f: f.cancelled() or slot.release())
+            raise
+    try:
+        yield
+    finally:
+        slot.release()
+
+def _clamd_address(config):
+    """Return (family, address) for a configured clamd daemon, or None."""
+    vs = config['virus_scanning']
+    if vs.get('clamd_socket'):
+        return socket.AF_UNIX, vs['clamd_socket']
+    if vs.get('clamd_host'):
+        return socket.AF_INET, (vs['clamd_host'], int(vs.get('clamd_port', 3310)))
+    return None
+
+def _clamd_connect(config):
+    family, address = _clamd_address(config)
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.settimeout(config['virus_scanning'].get('clamd_timeout', 60))
+    try:
+        sock.connect(address)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+def _clamd_read_replies(sock):
+    """Read NUL-terminated replies until clamd closes the connection."""
+    chunks = []
+    while data := sock.recv(4096):
+        chunks.append(data)
+    return [r for r in b"".join(chunks).decode("utf-8", "replace").split("\0") if r]
+
+def clamd_instream(fileobj, config):
+    """Stream a binary file object to clamd (INSTREAM) and return its reply."""
+    with _clamd_connect(config) as sock:
+        sock.sendall(b"zINSTREAM\0")
+        while chunk := fileobj.read(CLAMD_CHUNK_SIZE):
+            sock.sendall(struct.pack("!L", len(chunk)) + chunk)
+        sock.sendall(struct.pack("!L", 0))
+        replies = _clamd_read_replies(sock)
+    return replies[0] if replies else ""
+
+def clamd_configured(config):
+    """True when scans should go to a clamd daemon rather than clamscan."""
+    return _clamd_address(config) is not None
+
+def scan_stream_to_file(fileobj, dest, config):
+    """Copy fileobj to dest while streaming the same bytes to clamd.
+
+    The data is read once for both the write and the scan, so the file does
+    not have to be re-read by a separate scan afterwards. Returns the scan
+    result; infected files are moved to quarantine as in scan_file.
+    """
+    with _scan_slot(config):
+        return _scan_stream_to_file(fileobj, dest, config)
+
+def _scan_stream_to_file(fileobj, dest, config):
+    sock = None
+    try:
+        sock = _clamd_connect(config)
+        sock.sendall(b"zINSTREAM\0")
+    except OSError as e:
+        logger.error(f"clamd scan failed for {dest}: {e}")
+        if sock is not None:
+            sock.close()
+        sock = None
+    try:
+        with open(dest, "wb") as out:
+            while chunk := fileobj.read(CLAMD_CHUNK_SIZE):
+                out.write(chunk)
+                if sock is None:
+                    continue
+                try:
+                    sock.sendall(struct.pack("!L", len(chunk)) + chunk)
+                except OSError as e:
+                    # Keep copying so the extracted file is complete
+                    logger.error(f"clamd scan failed for {dest}: {e}")
+                    sock.close()
+                    sock = None
+        if sock is None:
+            return "error"
+        try:
+            sock.sendall(struct.pack("!L", 0))
+            replies = _clamd_read_replies(sock)
+        except OSError as e:
+            logger.error(f"clamd scan failed for {dest}: {e}")
+            return "error"
+    finally:
+        if sock is not None:
+            sock.close()
+    return _apply_verdict(dest, replies[0] if replies else "", config['directories']['quarantine'])
+
+def _apply_verdict(filepath, reply, quarantine):
+    """Translate a clamd reply into a scan result, quarantining infected files."""
+    if reply.endswith("FOUND"):
+        logger.warning(f"clamd flagged {filepath}: {reply}")
+        shutil.move(filepath, os.path.join(quarantine, os.path.basename(filepath)))
+        return "quarantined"
+    if reply.endswith("OK"):
+        logger.info(f"clamd: {filepath} - Status: CLEAN")
+        return "clean"
+    logger.error(f"clamd scan failed for {filepath}: {reply}")
+    return "error"
+
+def _clamd_scan(filepath, quarantine, config):
+    try:
+        with open(filepath, "rb") as f:
+            reply = clamd_instream(f, config)
+    except OSError as e:
+        logger.error(f"clamd scan failed for {filepath}: {e}")
+        return "error"
+    return _apply_verdict(filepath, reply, quarantine)
+
+def scan_file(filepath, config, st=None):
+    """Scan filepath and return "clean", "quarantined" or "error".
+
+    Pass st when the file's os.stat result is already known.
+    """
+    key = _scan_cache_key(filepath, st)
+    if _cached_verdict(key) == "clean":
+        logger.debug("Scan cache hit, skipping rescan: %s", filepath)
+        return "clean"
+    with _scan_slot(config):
+        result = _scan_file(filepath, config)
+    _remember_verdict(key, result)
+    return result
+
+def _scan_file(filepath, config):
     # Step 1: ClamAV
     clamscan = config['virus_scanning']['clamscan_path']
     quarantine = config['directories']['quarantine']
     os.makedirs(quarantine, exist_ok=True)
-    
+
+    # Prefer a running clamd: its signature database is already loaded,
+    # whereas clamscan reloads it on every invocation
+    if _clamd_address(config) is not None:
+        result = _clamd_scan(filepath, quarantine, config)
+        if result != "clean":
+            return result
     # Handle mock scanning for testing
-    if clamscan == "echo":
+    elif clamscan == "echo":
         logger.info(f"Mock ClamAV scan for: {filepath} - Status: CLEAN")
         return "clean"
-    
-    try:
-        result = subprocess.run([clamscan, "--move", quarantine, filepath], capture_output=True, text=True)
-        logger.info(f"ClamAV: {result.stdout}")
-        
-        if os.path.exists(os.path.join(quarantine, os.path.basename(filepath))):
-            return "quarantined"
-    except subprocess.CalledProcessError as e:
-        logger.error(f"ClamAV scan failed for {filepath}: {e}")
-        return "error"
-    except FileNotFoundError:
-        logger.error(f"ClamAV not found at path: {clamscan}")
-        logger.info("Install ClamAV or set clamscan_path to 'echo' for testing")
-        return "error"
-    
+    else:
+        try:
+            result = subprocess.run([clamscan, "--move", quarantine, filepath], capture_output=True, text=True)
+            logger.info(f"ClamAV: {result.stdout}")
+
+            if os.path.exists(os.path.join(quarantine, os.path.basename(filepath))):
+                return "quarantined"
+        except subprocess.CalledProcessError as e:
+            logger.error(f"ClamAV scan failed for {filepath}: {e}")
+            return "error"
+        except FileNotFoundError:
+            logger.error(f"ClamAV not found at path: {clamscan}")
+            logger.info("Install ClamAV or set clamscan_path to 'echo' for testing")
+            return "error"
+
     # (Optional) Step 2: VirusTotal
     vt_key = config['virus_scanning'].get('virustotal_api_key')
     if vt_key:
         # Placeholder: add VirusTotal scanning logic here
         pass
     return "clean"
+
+async def scan_file_async(filepath, config):
+    """Coroutine variant of scan_file for running many scans concurrently.
+
+    Each scan opens its own clamd connection, so sending one file never waits
+    on the reply for another. Without clamd, scan_file runs in a worker thread.
+    """
+    # asyncio is only needed for batch scans; importing it here keeps it out of module import
+    import asyncio
+    address = _clamd_address(config)
+    if address is None:
+        return await asyncio.to_thread(scan_file, filepath, config)
+
+    key = _scan_cache_key(filepath)
+    if _cached_verdict(key) == "clean":
+        logger.debug("Scan cache hit, skipping rescan: %s", filepath)
+        return "clean"
+    family, addr = address
+    async with _async_scan_slot(config):
+        return await _clamd_scan_async(filepath, config, key, family, addr)
+
+async def _clamd_scan_async(filepath, config, key, family, addr):
+    import asyncio
+    try:
+        if family == socket.AF_UNIX:
+            reader, writer = await asyncio.open_unix_connection(addr)
+        else:
+            reader, writer = await asyncio.open_connection(*addr)
+        try:
+            writer.write(b"zINSTREAM\0")
+            with open(filepath, "rb") as f:
+                while chunk := f.read(CLAMD_CHUNK_SIZE):
+                    writer.write(struct.pack("!L", len(chunk)) + chunk)
+                    await writer.drain()
+            writer.write(struct.pack("!L", 0))
+            await writer.drain()
+            timeout = config['virus_scanning'].get('clamd_timeout', 60)
+            reply = await asyncio.wait_for(reader.read(), timeout)
+        finally:
+            writer.close()
+            await writer.wait_closed()
+    except (OSError, asyncio.TimeoutError) as e:
+        logger.error(f"clamd scan failed for {filepath}: {e}")
+        return "error"
+    reply = reply.decode("utf-8", "replace").strip("\0")
+    result = _apply_verdict(filepath, reply, config['directories']['quarantine'])
+    _remember_verdict(key, result)
+    return result
+
+def scan_files(paths, config):
+    """Scan paths concurrently and return {path: result}.
+
+    At most virus_scanning.clamd_concurrency scans of this batch are in
+    flight at once, and all of them count towards max_concurrent_scans.
+    """
+    import asyncio
+    os.makedirs(config['directories']['quarantine'], exist_ok=True)
+
+    async def _scan_all():
+        limit = asyncio.Semaphore(config['virus_scanning'].get('clamd_concurrency', 8))
+
+        async def _scan(path):
+            async with limit:
+                return await scan_file_async(path, config)
+
+        return await asyncio.gather(*(_scan(path) for path in paths))
+
+    return dict(zip(paths, asyncio.run(_scan_all())))
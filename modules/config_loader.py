@@ -0,0 +1,28 @@
+import functools
+import logging
+import os
+import yaml
+
+# libyaml's parser when PyYAML was built with it, the pure-Python one otherwise
+try:
+    from yaml import CSafeLoader as _SafeLoader
+except ImportError:
+    from yaml import SafeLoader as _SafeLoader
+
+# Initialize logging for the config loader module
+logger = logging.getLogger("Orchestrator.ConfigLoader")
+logger.debug("Config loader module initialized")
+
+@functools.lru_cache(maxsize=32)
+def _load(path, mtime_ns, size):
+    # mtime_ns and size are only part of the cache key, so an edited file is re-parsed
+    with open(path, "rb") as f:
+        return yaml.load(f, Loader=_SafeLoader)
+
+def load_config(path="config.yaml"):
+    """Parse the YAML config at path, reusing the previous result while the file is unchanged.
+
+    The returned dict is shared between callers; treat it as read-only.
+    """
+    st = os.stat(path)
+    return _load(os.path.abspath(path), st.st_mtime_ns, st.st_size)
@@ -6,6 +6,20 @@ import subprocess
 import logging
 import tempfile
 import io
+from pathlib import PurePosixPath
+from modules.antivirus import scan_stream_to_file
+
+try:
+    import py7zr
+except ImportError:
+    py7zr = None
+
+# Initialize logging for the extract module
+logger = logging.getLogger("Orchestrator.Extract")
+logger.debug("Archive extraction module initialized")
+
+# Archive types whose members can be read one at a time in-process
+STREAMABLE_EXTENSIONS = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2")
 
 def run_command(cmd, cwd):
     try:
@@ -14,61 +28,195 @@ def run_command(cmd, cwd):
     except subprocess.CalledProcessError as e:
         return False, e.stderr
 
-def extract_archives(filepath, config):
-    logger = logging.getLogger("Orchestrator.Extract")
-    logger.debug("Archive extraction module initialized")
-    
-    # Use secure random temporary directory instead of predictable path
-    extract_to = tempfile.mkdtemp(prefix="secure_extract_", suffix="_tmp")
-    logger.debug(f"Created secure temporary directory: {extract_to}")
-    
-    extracted_files = []
-    ext = os.path.splitext(filepath)[1].lower()
+def make_extract_dir():
+    """Create a secure random temporary directory for archive extraction."""
+    return tempfile.mkdtemp(prefix="secure_extract_", suffix="_tmp")
+
+def extract_archives(filepath, config, extract_to=None):
+    """Extract an archive and return the paths of the extracted files.
 
-    # No need to clean since we're using a fresh secure temp directory
-    # The directory cleanup will happen in the finally block
+    The extracted files are left in place for the caller to process. Pass
+    extract_to (see make_extract_dir) to own the directory and remove it
+    afterwards; otherwise a secure temporary directory is created, and it is
+    only removed here when extraction fails.
+    """
+    
+    owns_dir = extract_to is None
+    if owns_dir:
+        # Use secure random temporary directory instead of predictable path
+        extract_to = make_extract_dir()
+        logger.debug("Created secure temporary directory: %s", extract_to)
 
+    extractor = _DISPATCH.get(_archive_key(filepath), _unsupported)
     try:
-        if ext == ".zip":
-            with zipfile.ZipFile(filepath, 'r') as zf:
-                zf.extractall(extract_to)
-            logger.info(f"Extracted ZIP: {filepath}")
-        elif any(filepath.endswith(x) for x in [".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar"]):
-            with tarfile.open(filepath, 'r:*') as tf:
-                tf.extractall(extract_to)
-            logger.info(f"Extracted TAR: {filepath}")
-        elif ext == ".rar" and shutil.which("unrar"):
-            cmd = ["unrar", "x", "-o+", filepath, extract_to]
-            success, output = run_command(cmd, cwd=os.path.dirname(filepath))
-            if success:
-                logger.info(f"Extracted RAR: {filepath}")
-            else:
-                logger.warning(f"RAR extraction failed: {filepath}")
-        elif ext == ".7z" and shutil.which("7z"):
-            cmd = ["7z", "x", filepath, f"-o{extract_to}", "-y"]
-            success, output = run_command(cmd, cwd=os.path.dirname(filepath))
-            if success:
-                logger.info(f"Extracted 7z: {filepath}")
-            else:
-                logger.warning(f"7z extraction failed: {filepath}")
-        else:
-            logger.warning(f"Unsupported archive type for: {filepath}")
-            return []
+        extracted_files = extractor(filepath, extract_to)
     except Exception as e:
         logger.error(f"Extraction failed for {filepath}: {e}")
+        _cleanup(extract_to, owns_dir)
         return []
+    if extracted_files is None:
+        logger.warning(f"Unsupported archive type for: {filepath}")
+        _cleanup(extract_to, owns_dir)
+        return []
+    logger.debug("Successfully extracted %s files", len(extracted_files))
+    return extracted_files
+
+def _archive_key(filepath):
+    """Return the dispatch key for filepath: '.tar.<x>' for compressed tars, else the last suffix."""
+    parts = os.path.basename(filepath).lower().rsplit(".", 2)
+    if len(parts) == 3 and parts[1] == "tar":
+        return f".tar.{parts[2]}"
+    return f".{parts[-1]}" if len(parts) > 1 else ""
+
+# ZIP and TAR extractors collect member paths as they extract; the external
+# and py7zr extractors do not report what they wrote, so their output
+# directory is walked afterwards. Each returns None when it cannot handle
+# the archive here (e.g. the tool is missing).
+
+def _extract_zip(filepath, extract_to):
+    extracted_files = []
+    with zipfile.ZipFile(filepath, 'r') as zf:
+        for info in zf.infolist():
+            if not info.is_dir():
+                extracted_files.append(zf.extract(info, extract_to))
+    logger.info(f"Extracted ZIP: {filepath}")
+    return extracted_files
+
+def _extract_tar(filepath, extract_to):
+    with tarfile.open(filepath, 'r:*') as tf:
+        members = list(_safe_tar_members(tf, filepath))
+        tf.extractall(extract_to, members=members)
+    logger.info(f"Extracted TAR: {filepath}")
+    return [_safe_member_path(extract_to, m.name) for m in members if m.isfile()]
 
-    # List extracted files
+def _extract_rar(filepath, extract_to):
+    if not shutil.which("unrar"):
+        return None
+    cmd = ["unrar", "x", "-o+", filepath, extract_to]
+    success, output = run_command(cmd, cwd=os.path.dirname(filepath))
+    if success:
+        logger.info(f"Extracted RAR: {filepath}")
+    else:
+        logger.warning(f"RAR extraction failed: {filepath}")
+    return _list_files(extract_to)
+
+def _extract_7z(filepath, extract_to):
+    if py7zr is not None:
+        # In-process extraction: no fork/exec of the 7z CLI
+        with py7zr.SevenZipFile(filepath, mode='r') as sz:
+            sz.extractall(path=extract_to)
+        logger.info(f"Extracted 7z: {filepath}")
+        return _list_files(extract_to)
+    if not shutil.which("7z"):
+        return None
+    cmd = ["7z", "x", filepath, f"-o{extract_to}", "-y"]
+    success, output = run_command(cmd, cwd=os.path.dirname(filepath))
+    if success:
+        logger.info(f"Extracted 7z: {filepath}")
+    else:
+        logger.warning(f"7z extraction failed: {filepath}")
+    return _list_files(extract_to)
+
+def _unsupported(filepath, extract_to):
+    return None
+
+def _list_files(directory):
+    """Return the regular files under directory; symlinks are not followed or listed."""
+    files = []
+    pending = [directory]
+    while pending:
+        with os.scandir(pending.pop()) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    files.append(entry.path)
+    return files
+
+_DISPATCH = {
+    ".zip": _extract_zip,
+    ".tar": _extract_tar,
+    ".tar.gz": _extract_tar,
+    ".tgz": _extract_tar,
+    ".tar.bz2": _extract_tar,
+    ".tbz2": _extract_tar,
+    ".rar": _extract_rar,
+    ".7z": _extract_7z,
+}
+
+def _cleanup(extract_to, owns_dir):
+    """Remove a temporary directory that extract_archives created itself."""
+    if not owns_dir:
+        return
     try:
-        for root, dirs, files in os.walk(extract_to):
-            for f in files:
-                extracted_files.append(os.path.join(root, f))
-        logger.debug(f"Successfully extracted {len(extracted_files)} files")
-        return extracted_files
-    finally:
-        # Clean up secure temporary directory
-        try:
-            shutil.rmtree(extract_to)
-            logger.debug(f"Cleaned up temporary directory: {extract_to}")
-        except Exception as e:
-            logger.warning(f"Failed to clean up temporary directory {extract_to}: {e}")
+        shutil.rmtree(extract_to)
+        logger.debug("Cleaned up temporary directory: %s", extract_to)
+    except Exception as e:
+        logger.warning(f"Failed to clean up temporary directory {extract_to}: {e}")
+
+def _safe_member_path(base, name):
+    """Return base joined with an archive member name, or None if it could escape base.
+
+    The check is purely lexical (absolute names and '..' components are
+    rejected), so it costs no abspath/realpath syscalls per member.
+    """
+    parts = PurePosixPath(name.replace("\\", "/")).parts
+    if not parts or parts[0] == "/" or ".." in parts:
+        return None
+    return os.path.join(base, *parts)
+
+def _safe_tar_members(tf, filepath):
+    """Yield the regular files and directories of a tar that stay inside the target."""
+    for member in tf:
+        if (member.isfile() or member.isdir()) and _safe_member_path("", member.name):
+            yield member
+        else:
+            logger.warning(f"Skipping unsafe archive member {member.name!r} in {filepath}")
+
+def _iter_stream_members(filepath):
+    """Yield (name, file object) for each regular file in a ZIP or TAR archive."""
+    if filepath.lower().endswith(".zip"):
+        with zipfile.ZipFile(filepath, 'r') as zf:
+            for info in zf.infolist():
+                if not info.is_dir():
+                    with zf.open(info) as member:
+                        yield info.filename, member
+    else:
+        with tarfile.open(filepath, 'r:*') as tf:
+            for member in tf:
+                # Regular files only: links and device nodes are never extracted
+                if member.isfile():
+                    yield member.name, tf.extractfile(member)
+
+def extract_and_scan_stream(filepath, config, extract_to):
+    """Extract a ZIP/TAR archive, scanning every member with clamd as it is written.
+
+    Each member is decompressed once and its bytes go to disk and to clamd
+    together. Infected members end up in quarantine. Returns (clean_files,
+    unscanned_files): the members clamd passed, and the members written
+    whose scan failed (e.g. the clamd connection dropped), which still need
+    a scan before they are used.
+    """
+    clean_files = []
+    unscanned_files = []
+    base = os.path.realpath(extract_to)
+    try:
+        for name, member in _iter_stream_members(filepath):
+            dest = _safe_member_path(base, name)
+            if dest is None:
+                logger.warning(f"Skipping unsafe archive member {name!r} in {filepath}")
+                continue
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            result = scan_stream_to_file(member, dest, config)
+            if result == "quarantined":
+                logger.warning(f"Archive member {name} of {filepath} quarantined by antivirus.")
+            elif result == "clean":
+                clean_files.append(dest)
+            else:
+                unscanned_files.append(dest)
+    except Exception as e:
+        logger.error(f"Extraction failed for {filepath}: {e}")
+        return [], []
+    logger.info(f"Extracted {len(clean_files) + len(unscanned_files)} files from: {filepath} "
+                f"({len(unscanned_files)} not scanned)")
+    return clean_files, unscanned_files
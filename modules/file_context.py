@@ -0,0 +1,27 @@
+import os
+from dataclasses import dataclass
+
+@dataclass
+class FileContext:
+    """A file moving through the pipeline, with the stat taken when it arrived.
+
+    process_new_file builds one per file so the scan, organize and text
+    extraction stages read the size, name and extension from here instead
+    of stat-ing and re-parsing the path again.
+    """
+    path: str
+    stat: os.stat_result
+    name: str
+    # Lowercased, including the dot ("" when there is none)
+    ext: str
+
+    @classmethod
+    def from_path(cls, path, st=None):
+        """Build the context for path, calling os.stat unless st is given.
+
+        Raises FileNotFoundError (or another OSError) if the file is gone.
+        """
+        if st is None:
+            st = os.stat(path)
+        name = os.path.basename(path)
+        return cls(path, st, name, os.path.splitext(name)[1].lower())
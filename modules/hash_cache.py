@@ -0,0 +1,54 @@
+import logging
+import os
+import sqlite3
+import threading
+
+# Initialize logging for the hash cache module
+logger = logging.getLogger("Orchestrator.HashCache")
+logger.debug("Persistent hash cache module initialized")
+
+# Commit after this many new digests rather than after every insert
+COMMIT_EVERY = 64
+
+class HashCache:
+    """SQLite-backed map of (st_dev, st_ino, st_size, st_mtime_ns, algo) -> hex digest.
+
+    Lets file_hash skip re-reading files across restarts. A changed size or
+    mtime gives a new key, so stale digests are never returned.
+    """
+
+    def __init__(self, path, commit_every=COMMIT_EVERY):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.commit_every = commit_every
+        self._uncommitted = 0
+        self._lock = threading.Lock()
+        # Shared by the worker threads, serialized by self._lock
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS hashes ("
+            " dev INTEGER, ino INTEGER, size INTEGER, mtime_ns INTEGER, algo TEXT, digest TEXT,"
+            " PRIMARY KEY (dev, ino, size, mtime_ns, algo)) WITHOUT ROWID"
+        )
+        self._db.commit()
+
+    def get(self, key):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT digest FROM hashes WHERE dev=? AND ino=? AND size=? AND mtime_ns=? AND algo=?", key
+            ).fetchone()
+        return row[0] if row else None
+
+    def put(self, key, digest):
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?, ?, ?)", (*key, digest))
+            self._uncommitted += 1
+            if self._uncommitted >= self.commit_every:
+                self._db.commit()
+                self._uncommitted = 0
+
+    def close(self):
+        with self._lock:
+            self._db.commit()
+            self._db.close()
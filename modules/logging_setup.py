@@ -1,14 +1,44 @@
+import atexit
 import logging
+import logging.handlers
 import os
+import queue
+
+LOG_MAX_BYTES = 100 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+
+# The listener started by the first setup_logging call
+_listener = None
 
 def setup_logging(log_path, level="INFO"):
+    """Route all logging through one queue listener writing to log_path and the console.
+
+    Like logging.basicConfig, only the first call configures anything; later
+    calls return the listener already running, so no record is written twice.
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
     os.makedirs(os.path.dirname(log_path), exist_ok=True)
     level = getattr(logging, level.upper(), logging.INFO)
-    logging.basicConfig(
-        level=level,
-        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
-        handlers=[
-            logging.FileHandler(log_path),
-            logging.StreamHandler()
-        ]
+    formatter = logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
+    file_handler = logging.handlers.RotatingFileHandler(
+        log_path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT
     )
+    stream_handler = logging.StreamHandler()
+    for handler in (file_handler, stream_handler):
+        handler.setFormatter(formatter)
+
+    # Loggers only enqueue records; a single listener thread does the file and
+    # console I/O, so scanning threads never wait on the handler locks
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, file_handler, stream_handler)
+    listener.start()
+    atexit.register(listener.stop)
+    # Attached directly: basicConfig would give the QueueHandler its own
+    # formatter and the records would be formatted twice
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    _listener = listener
+    return listener
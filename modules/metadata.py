@@ -1,30 +1,140 @@
+import atexit
+import contextlib
 import os
+import csv
 import logging
+import queue
+import tempfile
+import threading
+import time
 from datetime import datetime
-import pandas as pd
 
 # Initialize logging for the metadata module
 logger = logging.getLogger("Orchestrator.Metadata")
 logger.debug("Metadata extraction module initialized")
 
+INDEX_FIELDS = ["filename", "path", "size", "modified", "created"]
+# Rows are appended in batches of up to FLUSH_ROWS, or after FLUSH_INTERVAL
+# seconds, with a single write and fsync per batch
+FLUSH_ROWS = 128
+FLUSH_INTERVAL = 1.0
+
+# (csv_path, row) tuples, or a threading.Event asking for an immediate flush
+_row_queue = queue.SimpleQueue()
+_flusher = None
+_flusher_lock = threading.Lock()
+# Serializes full index rewrites: each one reads the index and replaces it
+_rewrite_lock = threading.Lock()
+
 def extract_metadata(filepath, config):
-    logger = logging.getLogger("Orchestrator.Metadata")
     ext = os.path.splitext(filepath)[1].lower()
+    st = os.stat(filepath)
     metadata = {
         "filename": os.path.basename(filepath),
         "path": filepath,
-        "size": os.path.getsize(filepath),
-        "modified": datetime.fromtimestamp(os.path.getmtime(filepath)).isoformat(),
-        "created": datetime.fromtimestamp(os.path.getctime(filepath)).isoformat(),
+        "size": st.st_size,
+        "modified": datetime.fromtimestamp(st.st_mtime).isoformat(),
+        "created": datetime.fromtimestamp(st.st_ctime).isoformat(),
     }
     # Extend here: add docx/pdf/image/ocr/etc extraction as needed
 
     # Save CSV index
     csv_path = os.path.join(config['directories']['organized'], "index.csv")
-    if os.path.exists(csv_path):
-        df = pd.read_csv(csv_path)
-        df = pd.concat([df, pd.DataFrame([metadata])], ignore_index=True)
+    if config.get('reindex'):
+        flush_metadata()
+        _rewrite_index(csv_path, metadata)
     else:
-        df = pd.DataFrame([metadata])
-    df.to_csv(csv_path, index=False)
+        _start_flusher()
+        _row_queue.put((csv_path, metadata))
     logger.info(f"Metadata indexed for {filepath}")
+
+def flush_metadata():
+    """Write out every queued index row; call before shutdown."""
+    if _flusher is None or not _flusher.is_alive():
+        return
+    done = threading.Event()
+    _row_queue.put(done)
+    done.wait()
+
+def _start_flusher():
+    global _flusher
+    if _flusher is not None:
+        return
+    with _flusher_lock:
+        if _flusher is None:
+            _flusher = threading.Thread(target=_flush_loop, name="metadata-flusher", daemon=True)
+            _flusher.start()
+            atexit.register(flush_metadata)
+
+def _flush_loop():
+    pending = {}
+    count = 0
+    deadline = None
+    while True:
+        timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+        try:
+            item = _row_queue.get(timeout=timeout)
+        except queue.Empty:
+            item = None
+        done = None
+        if isinstance(item, threading.Event):
+            done = item
+        elif item is not None:
+            csv_path, row = item
+            pending.setdefault(csv_path, []).append(row)
+            count += 1
+            if deadline is None:
+                deadline = time.monotonic() + FLUSH_INTERVAL
+        if pending and (done is not None or count >= FLUSH_ROWS or time.monotonic() >= deadline):
+            for csv_path, rows in pending.items():
+                try:
+                    _append_index(csv_path, rows)
+                except OSError as e:
+                    logger.error(f"Failed to write metadata index {csv_path}: {e}")
+            pending = {}
+            count = 0
+            deadline = None
+        if done is not None:
+            done.set()
+
+def _append_index(csv_path, rows):
+    """Append rows to the index, writing the header only for a new file."""
+    new_file = not os.path.exists(csv_path)
+    with open(csv_path, "a", newline="") as f:
+        writer = csv.DictWriter(f, INDEX_FIELDS)
+        if new_file:
+            writer.writeheader()
+        writer.writerows(rows)
+        f.flush()
+        os.fsync(f.fileno())
+
+def _rewrite_index(csv_path, metadata):
+    """Full rebuild of the index (config 'reindex': true).
+
+    The existing rows are re-read and the file is replaced atomically, so a
+    crash mid-write cannot leave a truncated index. Rewrites from several
+    workers run one at a time, so none of them drops another's row.
+    """
+    with _rewrite_lock:
+        rows = []
+        # mkstemp files are 0600; the rewritten index keeps the old file's mode
+        mode = 0o644
+        if os.path.exists(csv_path):
+            mode = os.stat(csv_path).st_mode & 0o777
+            with open(csv_path, newline="") as f:
+                rows = list(csv.DictReader(f))
+        rows.append(metadata)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(csv_path), prefix=".index.", suffix=".tmp")
+        try:
+            os.fchmod(fd, mode)
+            with open(fd, "w", newline="") as f:
+                writer = csv.DictWriter(f, INDEX_FIELDS, extrasaction="ignore")
+                writer.writeheader()
+                writer.writerows(rows)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, csv_path)
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.unlink(tmp_path)
+            raise
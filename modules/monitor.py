@@ -1,67 +1,178 @@
 import time
 import os
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
 from watchdog.observers import Observer
-from watchdog.events import FileSystemEventHandler
+from watchdog.observers.polling import PollingObserver
+from watchdog.events import (
+    FileClosedEvent,
+    FileCreatedEvent,
+    FileModifiedEvent,
+    FileMovedEvent,
+    PatternMatchingEventHandler,
+)
 
 # Initialize logging for the monitor module
 logger = logging.getLogger("Orchestrator.Monitor")
 logger.debug("File monitoring module initialized")
 
+# A path is dispatched once no new event has arrived for it in QUIET_PERIOD
+# seconds, so the burst of created/modified/closed events for one download
+# becomes a single callback
+QUIET_PERIOD = 0.5
+# Events for a path within this window after its dispatch are ignored
+DEBOUNCE_SECONDS = 2.0
+RECENT_MAX = 10_000
+
 class FolderMonitor:
-    def __init__(self, directory, callback):
+    def __init__(self, directory, callback, max_workers=None, ignore_patterns=None, use_close_events=False):
         self.directory = directory
         self.callback = callback
+        # Files are processed on a bounded pool, off the observer and timer threads
+        self.max_workers = max_workers or os.cpu_count() or 4
+        self.ignore_patterns = ignore_patterns
+        self.use_close_events = use_close_events
 
     def start(self):
-        event_handler = Handler(self.callback)
-        observer = Observer()
-        observer.schedule(event_handler, self.directory, recursive=False)
-        observer.start()
+        pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="monitor")
+        event_handler = Handler(self.callback, executor=pool, ignore_patterns=self.ignore_patterns)
+        # Only subscribe to the events the handler acts on, so the OS does not
+        # wake the observer for opens, reads and deletes in the directory
+        event_filter = [FileCreatedEvent, FileModifiedEvent, FileMovedEvent]
+        if self.use_close_events:
+            event_filter.append(FileClosedEvent)
+        try:
+            observer = Observer()
+            observer.schedule(event_handler, self.directory, recursive=False, event_filter=event_filter)
+            observer.start()
+        except OSError as e:
+            # e.g. inotify watch/instance limits reached
+            logger.warning(f"Native file observer unavailable ({e}), falling back to polling")
+            observer = PollingObserver()
+            observer.schedule(event_handler, self.directory, recursive=False, event_filter=event_filter)
+            observer.start()
         try:
-            while True:
-                time.sleep(1)
+            # Park the main thread until the observer exits
+            observer.join()
         except KeyboardInterrupt:
             observer.stop()
-        observer.join()
+            observer.join()
+            event_handler.cancel_pending()
+        finally:
+            # Let files already being processed finish before shutdown
+            pool.shutdown(wait=True)
 
-class Handler(FileSystemEventHandler):
-    def __init__(self, callback):
+class Handler(PatternMatchingEventHandler):
+    def __init__(self, callback, executor=None, ignore_patterns=None):
+        # Directories and ignored names (e.g. partial downloads) are filtered
+        # in dispatch, before any of the on_* methods run
+        super().__init__(ignore_patterns=ignore_patterns, ignore_directories=True)
+        # Called as callback(filepath, st=os.stat_result) once a path goes quiet
         self.callback = callback
-        self.processed_files = set()
-        self.logger = logging.getLogger("Orchestrator.Monitor")
+        # Runs the callback when given; otherwise it runs on the timer thread
+        self.executor = executor
+        # path -> [Timer, time of the latest event, latest event type] for
+        # paths waiting for their events to go quiet
+        self._pending = {}
+        # path -> monotonic dispatch time, oldest first
+        self._recent = OrderedDict()
+        self._lock = threading.Lock()
+        self.logger = logger
 
     def on_created(self, event):
-        if not event.is_directory:
-            self._handle_file_event(event.src_path, "created")
-    
+        self._handle_file_event(event.src_path, "created")
+
+    def on_modified(self, event):
+        # Extends the quiet period of a file that is still being written, or
+        # starts one for a file left in place earlier (e.g. skipped while empty)
+        self._handle_file_event(event.src_path, "modified")
+
     def on_moved(self, event):
-        if not event.is_directory and hasattr(event, 'dest_path'):
+        if event.dest_path:
             self._handle_file_event(event.dest_path, "moved")
-    
+
     def on_closed(self, event):
-        # Only handle close events for files that weren't created in this session
-        if not event.is_directory:
-            filepath = event.src_path
-            if filepath not in self.processed_files and os.path.exists(filepath):
-                self._handle_file_event(filepath, "closed")
+        self._handle_file_event(event.src_path, "closed")
 
     def _handle_file_event(self, filepath, event_type):
-        """Handle file events with deduplication and better logging."""
-        if filepath in self.processed_files:
-            self.logger.debug(f"File already processed, skipping {event_type} event: {filepath}")
+        """Start (or extend) the quiet period for filepath; it is dispatched once quiet."""
+        self.logger.debug("Queued %s event for: %s", event_type, filepath)
+        with self._lock:
+            entry = self._pending.get(filepath)
+            if entry is not None:
+                entry[1] = time.monotonic()
+                entry[2] = event_type
+                return
+            entry = self._pending[filepath] = [None, time.monotonic(), event_type]
+            self._schedule(filepath, entry, QUIET_PERIOD)
+
+    def _schedule(self, filepath, entry, delay):
+        """Arm one timer for a pending path; caller holds the lock."""
+        timer = threading.Timer(delay, self._dispatch, args=(filepath,))
+        timer.daemon = True
+        entry[0] = timer
+        timer.start()
+
+    def cancel_pending(self):
+        """Drop events still waiting for their quiet period (used on shutdown)."""
+        with self._lock:
+            for timer, _, _ in self._pending.values():
+                timer.cancel()
+            self._pending.clear()
+
+    def _dispatch(self, filepath):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._pending.get(filepath)
+            if entry is None or entry[0] is not threading.current_thread():
+                return  # cancelled
+            remaining = entry[1] + QUIET_PERIOD - now
+            if remaining > 0:
+                # Events arrived meanwhile: wait out the rest of the period
+                # with a single new timer rather than one per event
+                self._schedule(filepath, entry, remaining)
+                return
+            del self._pending[filepath]
+            event_type = entry[2]
+            self._prune(now)
+            if filepath in self._recent:
+                self.logger.debug("File recently processed, skipping %s event: %s", event_type, filepath)
+                return
+            self._recent[filepath] = now
+
+        if self.executor is None:
+            self._run(filepath, event_type)
             return
-            
-        if not os.path.exists(filepath):
-            self.logger.debug(f"File no longer exists for {event_type} event: {filepath}")
+        try:
+            self.executor.submit(self._run, filepath, event_type)
+        except RuntimeError:
+            # Shutting down; the startup pass picks the file up next run
+            self.logger.debug("Monitor stopping, not processing: %s", filepath)
+
+    def _run(self, filepath, event_type):
+        # The stat that confirms the file still exists is handed on, so the
+        # callback does not have to repeat it
+        try:
+            st = os.stat(filepath)
+        except FileNotFoundError:
+            self.logger.debug("File no longer exists for %s event: %s", event_type, filepath)
             return
-            
-        self.logger.debug(f"Processing {event_type} event for: {filepath}")
-        self.processed_files.add(filepath)
-        
+
+        self.logger.debug("Processing %s event for: %s", event_type, filepath)
         try:
-            self.callback(filepath)
-        except Exception as e:
-            self.logger.error(f"Error processing file {filepath}: {e}")
-            # Remove from processed set so it can be retried
-            self.processed_files.discard(filepath)
+            self.callback(filepath, st=st)
+        except Exception:
+            self.logger.exception(f"Error processing file {filepath}")
+            # Forget the path so a later event can retry it
+            with self._lock:
+                self._recent.pop(filepath, None)
+
+    def _prune(self, now):
+        """Drop expired entries (and the oldest beyond RECENT_MAX); caller holds the lock."""
+        while self._recent:
+            path, dispatched = next(iter(self._recent.items()))
+            if now - dispatched < DEBOUNCE_SECONDS and len(self._recent) < RECENT_MAX:
+                break
+            del self._recent[path]
@@ -1,65 +1,246 @@
+import contextlib
+import errno
+import functools
 import os
 import shutil
 import hashlib
+import importlib
+import itertools
 import logging
 import re
 import io
-from datetime import datetime
+import string
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+from modules.file_context import FileContext
+
+# Optional text-extraction backends (pypdf, pdfminer, python-docx, Pillow,
+# pytesseract, easyocr) are heavy to import, so they are only loaded by _lazy
+# the first time a file needs them
+_lazy_modules = {}
+_lazy_lock = threading.Lock()
+
+def _lazy(name):
+    """Import and memoize an optional module; None if it is not installed."""
+    try:
+        return _lazy_modules[name]
+    except KeyError:
+        pass
+    with _lazy_lock:
+        if name not in _lazy_modules:
+            try:
+                _lazy_modules[name] = importlib.import_module(name)
+            except ImportError:
+                _lazy_modules[name] = None
+        return _lazy_modules[name]
+
+# 'tesseract' (default) or 'easyocr'; see set_ocr_backend
+_ocr_backend = "tesseract"
+_easyocr_reader = None
+# EasyOCR readers are not documented as thread-safe; inference is serialized
+_easyocr_lock = threading.Lock()
+
+def set_ocr_backend(backend):
+    """Select the OCR engine ('tesseract' or 'easyocr'); call once at startup.
+
+    EasyOCR loads its models here and runs one warm-up inference, so the
+    first real file does not pay for model and CUDA initialization.
+    Falls back to tesseract when easyocr is not installed.
+    """
+    global _ocr_backend, _easyocr_reader
+    if backend == "easyocr":
+        easyocr = _lazy("easyocr")
+        if easyocr is None:
+            logger.warning("ocr_backend 'easyocr' requested but easyocr is not installed, using tesseract")
+            backend = "tesseract"
+        else:
+            import numpy
+            with _easyocr_lock:
+                if _easyocr_reader is None:
+                    _easyocr_reader = easyocr.Reader(["en"], gpu=True, cudnn_benchmark=True)
+                    _easyocr_reader.readtext(numpy.zeros((600, 800, 3), numpy.uint8), detail=0)
+    elif backend != "tesseract":
+        logger.warning(f"Unknown ocr_backend {backend!r}, using tesseract")
+        backend = "tesseract"
+    _ocr_backend = backend
+
+def _ocr(filepath):
+    """OCR an image file, or None when the selected OCR backend is unavailable."""
+    if _ocr_backend == "easyocr":
+        with _easyocr_lock:
+            return " ".join(_easyocr_reader.readtext(filepath, detail=0))
+    pil_image = _lazy("PIL.Image")
+    pytesseract = _lazy("pytesseract")
+    if pil_image is None or pytesseract is None:
+        return None
+    with pil_image.open(filepath) as image:
+        return pytesseract.image_to_string(image)
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
 
 try:
-    import pytesseract
-    from PIL import Image
-    import docx
-    from pdfminer.high_level import extract_text as extract_pdf_text
+    import blake3
 except ImportError:
-    pytesseract = None
-    Image = None
-    docx = None
-    extract_pdf_text = None
+    blake3 = None
 
 # Initialize logging for the organize module
 logger = logging.getLogger("Orchestrator.Organize")
 logger.debug("Organization module with OCR/content extraction and smart grouping initialized")
 
+# Used when the config has no content_organization section
+DEFAULT_KEYWORD_GROUPS = {
+    'Springfield': [
+        "springfield",
+        "spring_field", 
+        "spring-field",
+        "simpsons",
+        "homer",
+        "marge",
+        "bart",
+        "lisa",
+        "maggie"
+    ]
+}
+
+# Distinct keyword configurations whose compiled matchers are kept
+KEYWORD_MATCHER_CACHE_SIZE = 16
+
+@functools.lru_cache(maxsize=KEYWORD_MATCHER_CACHE_SIZE)
+def _keyword_matcher(keyword_groups):
+    """Return a callable mapping a lowercased name to its keyword folder or None.
+
+    keyword_groups is a tuple of (folder name, tuple of keywords), so the
+    cache is keyed on the keywords themselves: an edited config gets a new
+    matcher and the number kept is bounded. Groups keep their config
+    order: the first group with any keyword in the name wins, as before.
+    """
+    ordered = []
+    for folder_name, keywords in keyword_groups:
+        for keyword in keywords:
+            ordered.append((keyword.lower(), folder_name))
+
+    if ahocorasick is None or any(not keyword for keyword, _ in ordered):
+        # One alternation per group, so each group is a single C-level search
+        patterns = [
+            (re.compile("|".join(map(re.escape, (k.lower() for k in keywords)))), folder_name)
+            for folder_name, keywords in keyword_groups if keywords
+        ]
+        def match(name):
+            for pattern, folder_name in patterns:
+                if pattern.search(name):
+                    return folder_name
+            return None
+        return match
+
+    automaton = ahocorasick.Automaton()
+    for priority, (keyword, folder_name) in enumerate(ordered):
+        if keyword not in automaton:
+            automaton.add_word(keyword, (priority, folder_name))
+    automaton.make_automaton()
+
+    def match(name):
+        # One pass over the name; the lowest priority found is the first group
+        found = min((value for _, value in automaton.iter(name)), default=None)
+        return found[1] if found else None
+    return match
+
 def is_keyword_match_file(filepath, config):
     """Enhanced content-based file detection with configurable keywords."""
     base_name = os.path.basename(filepath).lower()
     
     # Get keyword groups from config, with Springfield as default example
-    keyword_groups = config.get('content_organization', {
-        'Springfield': [
-            "springfield",
-            "spring_field", 
-            "spring-field",
-            "simpsons",
-            "homer",
-            "marge",
-            "bart",
-            "lisa",
-            "maggie"
-        ]
-    })
-    
-    # Check each keyword group
-    for folder_name, keywords in keyword_groups.items():
-        for keyword in keywords:
-            if keyword.lower() in base_name:
-                return folder_name
-                
-    return None
+    keyword_groups = config.get('content_organization', DEFAULT_KEYWORD_GROUPS)
+    frozen = tuple((folder_name, tuple(keywords or ())) for folder_name, keywords in keyword_groups.items())
+    return _keyword_matcher(frozen)(base_name)
+
+# Read/update size for hashing without file_digest; large slices keep per-call overhead low
+HASH_CHUNK_SIZE = 1024 * 1024
+HASH_CACHE_SIZE = 50_000
+
+# (st_dev, st_ino, st_size, st_mtime_ns, algo) -> hex digest. Keyed by inode rather
+# than path so a file renamed or hard-linked in between is not re-read.
+_hash_cache = OrderedDict()
+_hash_cache_lock = threading.Lock()
+# Optional on-disk cache consulted after _hash_cache, so digests survive restarts
+_persistent_hash_cache = None
+
+IMAGE_EXTENSIONS = frozenset({".png", ".jpg", ".jpeg", ".tiff", ".tif", ".bmp", ".gif", ".webp", ".svg", ".ico", ".raw", ".heic", ".heif"})
+TEXT_EXTENSIONS = frozenset({".txt", ".csv", ".md"})
+
+# Digests here only name and deduplicate files, they authenticate nothing;
+# usedforsecurity=False keeps SHA-256 usable on FIPS builds
+_sha256 = functools.partial(hashlib.sha256, usedforsecurity=False)
+
+@functools.lru_cache(maxsize=None)
+def _hash_constructor(algo):
+    """Return the hash constructor for a 'hash_algo' setting (warning once if unavailable)."""
+    if algo == "blake3":
+        if blake3 is not None:
+            return blake3.blake3
+        logger.warning("hash_algo 'blake3' requested but blake3 is not installed, using sha256")
+    elif algo != "sha256":
+        logger.warning(f"Unknown hash_algo {algo!r}, using sha256")
+    return _sha256
 
-IMAGE_EXTENSIONS = [".png", ".jpg", ".jpeg", ".tiff", ".tif", ".bmp", ".gif", ".webp", ".svg", ".ico", ".raw", ".heic", ".heif"]
+def set_persistent_hash_cache(cache):
+    """Back file_hash with a persistent cache (see modules.hash_cache), or None."""
+    global _persistent_hash_cache
+    _persistent_hash_cache = cache
 
-def file_hash(filepath):
-    """Calculate SHA256 hash of a file with error handling."""
-    logger = logging.getLogger("Orchestrator.Organize")
+def _remember_hash(key, hash_value):
+    with _hash_cache_lock:
+        _hash_cache[key] = hash_value
+        _hash_cache.move_to_end(key)
+        if len(_hash_cache) > HASH_CACHE_SIZE:
+            _hash_cache.popitem(last=False)
+
+def _compute_hash(filepath, new_hasher):
+    """Read filepath and return its hex digest using new_hasher.
+
+    The file is read, never mmap-ed: a download still being truncated or
+    rewritten would raise SIGBUS on a mapping, which kills the process.
+    """
+    with open(filepath, "rb") as f:
+        if hasattr(hashlib, "file_digest"):
+            # Python 3.11+: the whole read/update loop runs in C
+            return hashlib.file_digest(f, new_hasher).hexdigest()
+        hasher = new_hasher()
+        buf = bytearray(HASH_CHUNK_SIZE)
+        view = memoryview(buf)
+        while n := f.readinto(buf):
+            hasher.update(view[:n])
+        return hasher.hexdigest()
+
+def file_hash(filepath, algo="sha256", st=None):
+    """Calculate the hash (SHA256, or BLAKE3 with algo='blake3') of a file with error handling.
+
+    Pass st when the file's os.stat result is already known.
+    """
     try:
-        hasher = hashlib.sha256()
-        with open(filepath, "rb") as f:
-            while chunk := f.read(8192):
-                hasher.update(chunk)
-        hash_value = hasher.hexdigest()
-        logger.debug(f"Calculated hash for {filepath}: {hash_value[:16]}...")
+        if st is None:
+            st = os.stat(filepath)
+        key = (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns, algo)
+        new_hasher = _hash_constructor(algo)
+        with _hash_cache_lock:
+            hash_value = _hash_cache.get(key)
+            if hash_value is not None:
+                _hash_cache.move_to_end(key)
+        if hash_value is None and _persistent_hash_cache is not None:
+            hash_value = _persistent_hash_cache.get(key)
+            if hash_value is not None:
+                _remember_hash(key, hash_value)
+        if hash_value is not None:
+            logger.debug("Hash cache hit for %s: %s...", filepath, hash_value[:16])
+            return hash_value
+        hash_value = _compute_hash(filepath, new_hasher)
+        _remember_hash(key, hash_value)
+        if _persistent_hash_cache is not None:
+            _persistent_hash_cache.put(key, hash_value)
+        logger.debug("Calculated hash for %s: %s...", filepath, hash_value[:16])
         return hash_value
     except Exception as e:
         logger.error(f"Failed to calculate hash for {filepath}: {e}")
@@ -76,112 +257,408 @@ def file_hash(filepath):
             logger.warning(f"Using fallback hash (now): {fallback_hash[:16]}...")
             return fallback_hash
 
-def extract_text(filepath):
+TEXT_CACHE_SIZE = 256
+# Longer texts are not cached, to bound the memory the cache can hold
+TEXT_CACHE_MAX_CHARS = 1024 * 1024
+
+# (st_dev, st_ino, st_size, st_mtime_ns) -> extracted text, so repeated
+# events for the same file do not re-run the PDF parser or OCR
+_text_cache = OrderedDict()
+_text_cache_lock = threading.Lock()
+
+def extract_text(filepath, st=None):
+    if st is None:
+        try:
+            st = os.stat(filepath)
+        except OSError:
+            return _extract_text(filepath)
+    key = (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+    with _text_cache_lock:
+        text = _text_cache.get(key)
+        if text is not None:
+            _text_cache.move_to_end(key)
+            return text
+    text = _extract_text(filepath)
+    if len(text) <= TEXT_CACHE_MAX_CHARS:
+        with _text_cache_lock:
+            _text_cache[key] = text
+            if len(_text_cache) > TEXT_CACHE_SIZE:
+                _text_cache.popitem(last=False)
+    return text
+
+def _extract_pdf(filepath):
+    # pypdf reads the text layer directly and is several times faster than
+    # pdfminer's layout analysis; pdfminer is kept for PDFs pypdf cannot decode
+    pypdf = _lazy("pypdf")
+    if pypdf is not None:
+        try:
+            reader = pypdf.PdfReader(filepath)
+            text = "\n".join(page.extract_text() or "" for page in reader.pages)
+            if text.strip():
+                return text
+        except Exception as e:
+            logger.debug("pypdf failed on %s, trying pdfminer: %s", filepath, e)
+    pdfminer = _lazy("pdfminer.high_level")
+    if pdfminer is None:
+        return None
+    text = pdfminer.extract_text(filepath)
+    # An empty text layer (scanned PDF) falls through to OCR
+    return text if text and text.strip() else None
+
+def _extract_docx(filepath):
+    docx = _lazy("docx")
+    if docx is None:
+        return None
+    doc = docx.Document(filepath)
+    return "\n".join([p.text for p in doc.paragraphs])
+
+def _extract_plain(filepath):
+    with open(filepath, "r", encoding="utf-8", errors="ignore") as f:
+        return f.read()
+
+# Extension -> extractor returning the text, or None to fall back to OCR
+_EXTRACTORS = {
+    ".pdf": _extract_pdf,
+    ".docx": _extract_docx,
+    **{ext: _extract_plain for ext in TEXT_EXTENSIONS},
+    **{ext: _ocr for ext in IMAGE_EXTENSIONS},
+}
+
+def _extract_text(filepath):
     ext = os.path.splitext(filepath)[1].lower()
+    extractor = _EXTRACTORS.get(ext)
     try:
-        if ext == ".pdf" and extract_pdf_text is not None:
-            text = extract_pdf_text(filepath)
-            if text and text.strip():
-                return text
-        elif ext == ".docx" and docx is not None:
-            doc = docx.Document(filepath)
-            return "\n".join([p.text for p in doc.paragraphs])
-        elif ext in [".txt", ".csv", ".md"]:
-            with open(filepath, "r", encoding="utf-8", errors="ignore") as f:
-                return f.read()
-        elif ext in IMAGE_EXTENSIONS and pytesseract and Image:
-            image = Image.open(filepath)
-            return pytesseract.image_to_string(image)
+        if extractor is not None and (text := extractor(filepath)) is not None:
+            return text
         # Fallback: try OCR for anything else (e.g. scanned PDFs as images)
-        if pytesseract and Image:
-            try:
-                image = Image.open(filepath)
-                return pytesseract.image_to_string(image)
-            except Exception:
-                pass
+        if extractor is not _ocr:
+            with contextlib.suppress(Exception):
+                if (text := _ocr(filepath)) is not None:
+                    return text
     except Exception as e:
-        logging.getLogger("Orchestrator.Organize").warning(f"Text extraction failed for {filepath}: {e}")
+        logger.warning(f"Text extraction failed for {filepath}: {e}")
     return ""
 
-EMAIL_RE = re.compile(r"([a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+)")
-DATE_RE = re.compile(
-    r"((?:19|20)\d{2}[-/. ](?:0[1-9]|1[0-2])[-/. ](?:0[1-9]|[12][0-9]|3[01])|" # YYYY-MM-DD
-    r"(?:0[1-9]|[12][0-9]|3[01])[-/. ](?:0[1-9]|1[0-2])[-/. ](?:19|20)\d{2})"   # DD-MM-YYYY
+# The lookbehinds only let a match start at the beginning of a run of
+# address/digit characters, so a long run without an '@' (or a long digit
+# string) is scanned once instead of once per character
+EMAIL_PATTERN = r"(?<![a-zA-Z0-9_.+-])[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9.-]+\b"
+DATE_PATTERN = (
+    r"(?<!\d)(?:"
+    r"(?P<y1>(?:19|20)\d{2})[-/. ](?P<m1>0[1-9]|1[0-2])[-/. ](?P<d1>0[1-9]|[12][0-9]|3[01])|"  # YYYY-MM-DD
+    r"(?P<d2>0[1-9]|[12][0-9]|3[01])[-/. ](?P<m2>0[1-9]|1[0-2])[-/. ](?P<y2>(?:19|20)\d{2})"   # DD-MM-YYYY
+    r")(?!\d)"
 )
+# Only this much of the extracted text is searched for a sender and date;
+# they belong to the header, and OCR output can run to megabytes
+SENDER_DATE_SCAN_CHARS = 64 * 1024
+EMAIL_RE = re.compile(f"({EMAIL_PATTERN})", re.ASCII)
+# Searched separately from EMAIL_RE: a date may sit inside text an address
+# match consumes (e.g. "2024-01-15.bob@example.com")
+DATE_RE = re.compile(DATE_PATTERN, re.ASCII)
+# Default size limit (config 'ocr_max_bytes') for text extraction
+OCR_MAX_BYTES = 20_000_000
+# Maps every ASCII character not allowed in a sender folder name to "_";
+# str.translate applies it without going through the regex engine
+SAFE_SENDER_CHARS = frozenset(string.ascii_letters + string.digits + "@._-")
+UNSAFE_SENDER_TABLE = str.maketrans({chr(i): "_" for i in range(128) if chr(i) not in SAFE_SENDER_CHARS})
 
-def normalize_date(raw_date):
-    for fmt in ("%Y-%m-%d", "%Y/%m/%d", "%Y.%m.%d", "%d-%m-%Y", "%d/%m/%Y", "%d.%m.%Y"):
-        try:
-            dt = datetime.strptime(raw_date, fmt)
-            return dt.strftime("%Y-%m-%d")
-        except Exception:
-            continue
-    return "UnknownDate"
+def _safe_sender(sender):
+    """Return sender with every character outside [a-zA-Z0-9@._-] replaced by '_'."""
+    if not sender.isascii():
+        # One '?' per non-ASCII character, which the table then maps to '_'
+        sender = sender.encode("ascii", "replace").decode("ascii")
+    return sender.translate(UNSAFE_SENDER_TABLE)
+
+def _match_date(match):
+    """Return the ISO date for a DATE_PATTERN match, or "UnknownDate" if it is not a real date."""
+    if match.group("y1"):
+        year, month, day = match.group("y1", "m1", "d1")
+    else:
+        year, month, day = match.group("y2", "m2", "d2")
+    try:
+        return date(int(year), int(month), int(day)).isoformat()
+    except ValueError:  # e.g. 31-02-2024
+        return "UnknownDate"
 
 def extract_sender_and_date(text):
-    email_match = EMAIL_RE.search(text)
+    """Return the first email address and first date in the head of text."""
+    email_match = EMAIL_RE.search(text, 0, SENDER_DATE_SCAN_CHARS)
+    date_match = DATE_RE.search(text, 0, SENDER_DATE_SCAN_CHARS)
     sender = email_match.group(1) if email_match else "UnknownSender"
-
-    date_match = DATE_RE.search(text)
-    if date_match:
-        sent_date = normalize_date(date_match.group(0).replace(" ", "-").replace("/", "-").replace(".", "-"))
-    else:
-        sent_date = "UnknownDate"
+    sent_date = _match_date(date_match) if date_match else "UnknownDate"
     return sender, sent_date
 
-def organize_file(filepath, config):
-    logger = logging.getLogger("Orchestrator.Organize")
-    
-    # Check if file still exists before processing
-    if not os.path.exists(filepath):
-        logger.warning(f"File no longer exists, skipping: {filepath}")
+def extract_sender_and_date_streaming(chunks):
+    """extract_sender_and_date over text that arrives in chunks (pages, paragraphs).
+
+    Each chunk is searched on its own, so nothing already read is scanned
+    again; the first sender and the first date win, as in one pass over
+    the whole text. Stops pulling chunks once both are found or
+    SENDER_DATE_SCAN_CHARS of text have been read. Returns None if the
+    chunks held no text at all.
+    """
+    sender = sent_date = None
+    seen = 0
+    for chunk in chunks:
+        if not chunk or not chunk.strip():
+            continue
+        chunk_sender, chunk_date = extract_sender_and_date(chunk[:SENDER_DATE_SCAN_CHARS - seen])
+        if sender is None and chunk_sender != "UnknownSender":
+            sender = chunk_sender
+        if sent_date is None and chunk_date != "UnknownDate":
+            sent_date = chunk_date
+        seen += len(chunk)
+        if (sender is not None and sent_date is not None) or seen >= SENDER_DATE_SCAN_CHARS:
+            break
+    if not seen:
         return None
-        
-    logger.debug(f"Starting organization of: {filepath}")
+    return sender or "UnknownSender", sent_date or "UnknownDate"
+
+def _iter_pdf_pages(filepath):
+    """Yield the text of each PDF page with pypdf; nothing if pypdf is unavailable."""
+    pypdf = _lazy("pypdf")
+    if pypdf is None:
+        return
+    try:
+        for page in pypdf.PdfReader(filepath).pages:
+            yield page.extract_text()
+    except Exception as e:
+        logger.debug("pypdf failed on %s: %s", filepath, e)
+
+def _iter_docx_paragraphs(filepath):
+    """Yield the text of each .docx paragraph; nothing if python-docx is unavailable."""
+    docx = _lazy("docx")
+    if docx is None:
+        return
+    try:
+        for paragraph in docx.Document(filepath).paragraphs:
+            yield paragraph.text
+    except Exception as e:
+        logger.debug("python-docx failed on %s: %s", filepath, e)
+
+def _iter_plain_head(filepath):
+    """Yield the part of a text file that extract_sender_and_date would search."""
+    with open(filepath, "r", encoding="utf-8", errors="ignore") as f:
+        yield f.read(SENDER_DATE_SCAN_CHARS)
+
+# Extension -> generator of text chunks for extract_sender_and_date_streaming
+_CHUNK_EXTRACTORS = {
+    ".pdf": _iter_pdf_pages,
+    ".docx": _iter_docx_paragraphs,
+    **{ext: _iter_plain_head for ext in TEXT_EXTENSIONS},
+}
+
+def _files_equal(a, b):
+    """Byte-compare two files, stopping at the first differing block."""
+    if os.path.getsize(a) != os.path.getsize(b):
+        return False
+    with open(a, "rb") as fa, open(b, "rb") as fb:
+        while True:
+            block = fa.read(HASH_CHUNK_SIZE)
+            if block != fb.read(HASH_CHUNK_SIZE):
+                return False
+            if not block:
+                return True
+
+# Destination directories already created or verified by this process
+_ENSURED_DIRS = set()
+
+def _ensure_dir(path):
+    """os.makedirs(path, exist_ok=True), skipped for directories seen before."""
+    if path in _ENSURED_DIRS:
+        return
+    os.makedirs(path, exist_ok=True)
+    _ENSURED_DIRS.add(path)
+
+# Names given by the original scheme, which prefixed every organized file
+# with the first 8 hex digits of its hash
+LEGACY_NAME_RE = re.compile(r"[0-9a-f]{8}_(.+)", re.ASCII | re.DOTALL)
+# dest_dir -> {name: [legacy {hash8}_{name} entries]}, listed once per directory
+_LEGACY_NAMES = {}
+
+def _legacy_names(dest_dir):
+    """Return the {hash8}_{name} files in dest_dir, grouped by name."""
+    names = _LEGACY_NAMES.get(dest_dir)
+    if names is None:
+        names = {}
+        with contextlib.suppress(FileNotFoundError), os.scandir(dest_dir) as it:
+            for entry in it:
+                if (m := LEGACY_NAME_RE.fullmatch(entry.name)) is not None:
+                    names.setdefault(m.group(1), []).append(entry.name)
+        _LEGACY_NAMES[dest_dir] = names
+    return names
+
+def _legacy_duplicate(filepath, base_name, dest_dir):
+    """Return the path of a file organized under the old {hash8}_{name} scheme with
+    the same content as filepath, or None.
+
+    Candidates are byte-compared (sizes first), so nothing is hashed.
+    """
+    for name in _legacy_names(dest_dir).get(base_name, ()):
+        path = os.path.join(dest_dir, name)
+        with contextlib.suppress(FileNotFoundError):
+            if _files_equal(filepath, path):
+                return path
+    return None
+
+# (source st_dev, organized root) pairs a hard link has already failed for
+# with EXDEV; later moves between them go straight to the copy
+_CROSS_DEVICE_MOVES = set()
+# link() errors meaning the filesystem cannot hard-link this file at all
+_NO_LINK_ERRNOS = frozenset({errno.EPERM, errno.EMLINK, errno.ENOTSUP, errno.EOPNOTSUPP, errno.ENOSYS})
+
+def _claim(path):
+    """Create path as an empty placeholder; FileExistsError if it already exists."""
+    os.close(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600))
+
+def _fast_move(src, dst, pair=None):
+    """Move src to dst, raising FileExistsError instead of replacing an existing dst.
+
+    The destination is claimed atomically, so workers moving same-named
+    files at once never overwrite each other. On one filesystem src is
+    hard-linked to dst and then unlinked. Across filesystems dst is first
+    created with O_EXCL, then filled with shutil.copyfile (sendfile on
+    Linux, so the bytes never pass through Python) and the source removed.
+    pair identifies the source/destination filesystems so the failing link
+    is only attempted once per pair.
+    """
+    if pair is None or pair not in _CROSS_DEVICE_MOVES:
+        try:
+            os.link(src, dst, follow_symlinks=False)
+        except OSError as e:
+            if e.errno == errno.EXDEV:
+                if pair is not None:
+                    _CROSS_DEVICE_MOVES.add(pair)
+            elif e.errno in _NO_LINK_ERRNOS:
+                # No hard links here: claim the name, then rename over the placeholder
+                _claim(dst)
+                try:
+                    os.rename(src, dst)
+                except BaseException:
+                    with contextlib.suppress(OSError):
+                        os.unlink(dst)
+                    raise
+                return
+            else:
+                raise
+        else:
+            os.unlink(src)
+            return
+    _claim(dst)
+    try:
+        shutil.copyfile(src, dst)
+        shutil.copystat(src, dst)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(dst)
+        raise
+    os.unlink(src)
+
+def _move_into(src, dest_path, dest_dir, pair):
+    """_fast_move, recreating dest_dir once if it was removed from under the cache."""
+    try:
+        _fast_move(src, dest_path, pair)
+    except FileNotFoundError:
+        if not os.path.exists(src):
+            raise
+        _ENSURED_DIRS.discard(dest_dir)
+        _ensure_dir(dest_dir)
+        _fast_move(src, dest_path, pair)
+
+def _candidate_names(filepath, base_name, config, st):
+    """Yield destination names for a file: its own name first, then hash-prefixed ones.
+
+    The hash is only computed once the plain name turns out to be taken.
+    """
+    yield base_name
+    hash_val = file_hash(filepath, config.get('hash_algo', 'sha256'), st)
+    yield f"{hash_val[:8]}_{base_name}"
+    yield f"{hash_val}_{base_name}"
+    for n in itertools.count(1):
+        yield f"{hash_val}_{n}_{base_name}"
+
+def organize_file(filepath, config, ctx=None):
+    # Check if file still exists before processing; the one stat also
+    # supplies the size used below. process_new_file passes the FileContext
+    # it already built, so nothing is stat-ed here.
+    if ctx is None:
+        try:
+            ctx = FileContext.from_path(filepath)
+        except FileNotFoundError:
+            logger.warning(f"File no longer exists, skipping: {filepath}")
+            return None
+    st = ctx.stat
+
+    logger.debug("Starting organization of: %s", filepath)
     
     org_dir = config['directories']['organized']
-    base_name = os.path.basename(filepath)
-    hash_val = file_hash(filepath)
-    ext = os.path.splitext(filepath)[1].lower()
+    base_name = ctx.name
+    ext = ctx.ext
     
-    logger.debug(f"File details - Name: {base_name}, Extension: {ext}, Hash: {hash_val[:8]}")
+    logger.debug("File details - Name: %s, Extension: %s", base_name, ext)
 
     # 1. PHOTOS GROUPING
     if ext in IMAGE_EXTENSIONS:
         dest_dir = os.path.join(org_dir, "Photos")
-        logger.debug(f"Identified as image file, organizing to Photos folder")
-        os.makedirs(dest_dir, exist_ok=True)
-        logger.debug(f"Created/verified Photos directory: {dest_dir}")
+        logger.debug("Identified as image file, organizing to Photos folder")
+        _ensure_dir(dest_dir)
+        logger.debug("Created/verified Photos directory: %s", dest_dir)
     # 2. CONTENT-BASED KEYWORD GROUPING (configurable)
     elif (keyword_folder := is_keyword_match_file(filepath, config)) is not None:
         dest_dir = os.path.join(org_dir, keyword_folder)
-        logger.debug(f"Identified as {keyword_folder} file, organizing to {keyword_folder} folder")
-        os.makedirs(dest_dir, exist_ok=True)
-        logger.debug(f"Created/verified {keyword_folder} directory: {dest_dir}")
+        logger.debug("Identified as %s file, organizing to %s folder", keyword_folder, keyword_folder)
+        _ensure_dir(dest_dir)
+        logger.debug("Created/verified %s directory: %s", keyword_folder, dest_dir)
     # 3. DEFAULT: SENDER/DATE
     else:
-        logger.debug(f"Processing as default file type, extracting text content")
-        text = extract_text(filepath)
-        sender, sent_date = extract_sender_and_date(text)
-        safe_sender = re.sub(r"[^a-zA-Z0-9@._-]", "_", sender)
+        logger.debug("Processing as default file type, extracting text content")
+        # Text extraction/OCR is by far the most expensive step; skip it for
+        # files too large to be worth reading for a sender and date
+        found = None
+        if st.st_size <= config.get('ocr_max_bytes', OCR_MAX_BYTES):
+            if (chunker := _CHUNK_EXTRACTORS.get(ext)) is not None:
+                # Read page by page / paragraph by paragraph, stopping once
+                # both fields are found; files without any text fall through
+                # to extract_text and OCR
+                found = extract_sender_and_date_streaming(chunker(filepath))
+            if found is None:
+                found = extract_sender_and_date(extract_text(filepath, st))
+        else:
+            logger.debug("File too large for text extraction, skipping: %s", filepath)
+            found = ("UnknownSender", "UnknownDate")
+        sender, sent_date = found
+        safe_sender = _safe_sender(sender)
         safe_date = sent_date if sent_date != "UnknownDate" else "UnknownDate"
         dest_dir = os.path.join(org_dir, safe_sender, safe_date)
-        logger.debug(f"Identified sender: {sender} -> {safe_sender}, date: {sent_date} -> {safe_date}")
-        os.makedirs(dest_dir, exist_ok=True)
-        logger.debug(f"Created/verified directory: {dest_dir}")
+        logger.debug("Identified sender: %s -> %s, date: %s -> %s", sender, safe_sender, sent_date, safe_date)
+        _ensure_dir(dest_dir)
+        logger.debug("Created/verified directory: %s", dest_dir)
 
-    dest_name = f"{hash_val[:8]}_{base_name}"
-    dest_path = os.path.join(dest_dir, dest_name)
-    
-    logger.debug(f"Target destination: {dest_path}")
-
-    if os.path.exists(dest_path):
-        logger.info(f"Duplicate detected (hash): {filepath} == {dest_path}")
-        logger.debug(f"Removing duplicate source file: {filepath}")
+    # Files keep their own name; the content is only read when that name is
+    # taken. Identical content is a duplicate, anything else is renamed
+    # after its hash. Each name is claimed atomically by _fast_move, so a
+    # name another worker takes meanwhile is never overwritten.
+    # Files organized before this scheme carry a hash prefix; a re-download
+    # of one of them is a duplicate even though its plain name is free.
+    move_pair = (st.st_dev, org_dir)
+    if (existing := _legacy_duplicate(filepath, base_name, dest_dir)) is not None:
+        logger.info(f"Duplicate detected: {filepath} == {existing}")
+        logger.debug("Removing duplicate source file: %s", filepath)
         os.remove(filepath)
+        return existing
+    for name in _candidate_names(filepath, base_name, config, st):
+        dest_path = os.path.join(dest_dir, name)
+        logger.debug("Target destination: %s", dest_path)
+        try:
+            _move_into(filepath, dest_path, dest_dir, move_pair)
+        except FileExistsError:
+            if _files_equal(filepath, dest_path):
+                logger.info(f"Duplicate detected: {filepath} == {dest_path}")
+                logger.debug("Removing duplicate source file: %s", filepath)
+                os.remove(filepath)
+                return dest_path
+            logger.debug("Name already taken by different content: %s", dest_path)
+            continue
+        logger.info(f"Successfully organized: {base_name} -> {dest_path}")
         return dest_path
-
-    logger.debug(f"Moving file from {filepath} to {dest_path}")
-    shutil.move(filepath, dest_path)
-    logger.info(f"Successfully organized: {base_name} -> {dest_path}")
-    return dest_path
@@ -0,0 +1,48 @@
+import logging
+import os
+import sqlite3
+import threading
+
+# Initialize logging for the processed-files cache module
+logger = logging.getLogger("Orchestrator.ProcessedCache")
+logger.debug("Processed-files cache module initialized")
+
+class ProcessedCache:
+    """SQLite-backed record of archives that were already scanned clean and extracted.
+
+    Keyed by (digest, size, algo) of the file's content, so a renamed or
+    re-downloaded copy is recognized too. The value is the archive's path
+    when it was extracted. Only the extraction is skipped on a hit; the
+    archive itself is still scanned.
+    """
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        # Shared by the worker threads, serialized by self._lock
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS processed ("
+            " digest TEXT, size INTEGER, algo TEXT, result TEXT,"
+            " PRIMARY KEY (digest, size, algo)) WITHOUT ROWID"
+        )
+        self._db.commit()
+
+    def get(self, digest, size, algo):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT result FROM processed WHERE digest=? AND size=? AND algo=?", (digest, size, algo)
+            ).fetchone()
+        return row[0] if row else None
+
+    def put(self, digest, size, algo, result):
+        # Committed at once: entries are few (one per extracted archive)
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO processed VALUES (?, ?, ?, ?)", (digest, size, algo, result))
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
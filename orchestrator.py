@@ -1,101 +1,243 @@
+import contextlib
+import contextvars
 import logging
 import os
-import yaml
+import shutil
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from modules.config_loader import load_config
 from modules.logging_setup import setup_logging
 from modules.monitor import FolderMonitor
-from modules.antivirus import scan_file
-from modules.extract import extract_archives
-from modules.organize import organize_file
-from modules.metadata import extract_metadata
+from modules.antivirus import scan_file, scan_files, clamd_configured
+from modules.extract import extract_archives, extract_and_scan_stream, make_extract_dir, STREAMABLE_EXTENSIONS
+from modules.organize import organize_file, file_hash, set_persistent_hash_cache, set_ocr_backend
+from modules.hash_cache import HashCache
+from modules.processed_cache import ProcessedCache
+from modules.file_context import FileContext
+from modules.metadata import extract_metadata, flush_metadata
 
 # Load config
-with open("config.yaml") as f:
-    config = yaml.safe_load(f)
+config = load_config("config.yaml")
 
 setup_logging(config['directories']['logs'], config.get('log_level', 'INFO'))
 logger = logging.getLogger("Orchestrator")
 
+# Persist file hashes across restarts when a cache path is configured
+hash_cache = None
+if config['directories'].get('hash_cache'):
+    hash_cache = HashCache(config['directories']['hash_cache'])
+    set_persistent_hash_cache(hash_cache)
+
+# Remember archives that were already extracted, so dropping the same
+# download again (or restarting with archives still in the watch directory)
+# does not extract it again. They are still scanned every time.
+processed_cache = None
+if config['directories'].get('processed_cache'):
+    processed_cache = ProcessedCache(config['directories']['processed_cache'])
+
+set_ocr_backend(config.get('ocr_backend', 'tesseract'))
+
 # Extensions to ignore (incomplete downloads, temp files)
 IGNORE_EXTENSIONS = [".part", ".crdownload", ".tmp"]
+# Lowercased suffix tuples for a single C-level str.endswith per check
+IGNORE_SUFFIXES = tuple(ext.lower() for ext in IGNORE_EXTENSIONS)
+ARCHIVE_SUFFIXES = tuple(ext.lower() for ext in config['archive_extensions'])
+# Settings read on every file are looked up once here
+HASH_ALGO = config.get('hash_algo', 'sha256')
+# Archives nested deeper than this are organized as plain files, not extracted
+MAX_EXTRACTION_DEPTH = config.get('max_extraction_depth', 3)
+# Extracted members organized in parallel per archive
+MEMBER_WORKERS = config.get('member_workers', 4)
+# Watch-directory entries listed and queued at a time at startup
+EXISTING_FILES_CHUNK = 10_000
+
+# How many archives the file being processed is nested in. Each member
+# task runs in its own copy of the context, so worker threads never see
+# another archive's level.
+_extraction_depth = contextvars.ContextVar("extraction_depth", default=0)
 
-def process_new_file(filepath):
+def process_new_file(filepath, scanned=False, st=None):
     logger.info(f"Processing new file: {filepath}")
     
-    # Check if file exists first
-    if not os.path.exists(filepath):
+    # One stat for the whole pipeline: the scan and organize stages reuse
+    # it. Callers that listed the file with scandir pass theirs in as st.
+    try:
+        ctx = FileContext.from_path(filepath, st)
+    except FileNotFoundError:
         logger.warning(f"File no longer exists, skipping: {filepath}")
         return
-
-    # Get file info for logging
-    file_size = os.path.getsize(filepath)
-    file_ext = os.path.splitext(filepath)[1].lower()
-    logger.debug(f"File details - Size: {file_size} bytes, Extension: {file_ext}")
+    lower_name = ctx.name.lower()
+    logger.debug("File details - Size: %s bytes, Extension: %s", ctx.stat.st_size, ctx.ext)
 
     # Ignore incomplete/temp files
-    if any(filepath.lower().endswith(ext) for ext in IGNORE_EXTENSIONS):
+    if lower_name.endswith(IGNORE_SUFFIXES):
         logger.info(f"Ignored incomplete/temp file: {filepath}")
         return
 
-    # Step 1: Virus scan
-    logger.debug(f"Starting virus scan for: {filepath}")
-    scan_result = scan_file(filepath, config)
-    if scan_result == "quarantined":
-        logger.warning(f"File {filepath} quarantined by antivirus.")
+    # An empty download is usually aborted or still being created; leave it
+    # for the event that follows its first write instead of scanning nothing
+    if ctx.stat.st_size == 0 and not scanned:
+        logger.info(f"Skipping empty file: {filepath}")
         return
-    logger.debug(f"Virus scan passed for: {filepath}")
+
+    # Step 1: Virus scan (extracted files arrive already scanned as a batch).
+    # Always run, even for content seen before: a verdict must not outlive a
+    # signature update.
+    scan_result = None
+    if not scanned:
+        logger.debug("Starting virus scan for: %s", filepath)
+        scan_result = scan_file(filepath, config, ctx.stat)
+        if scan_result == "quarantined":
+            logger.warning(f"File {filepath} quarantined by antivirus.")
+            return
+        logger.debug("Virus scan passed for: %s", filepath)
 
     # Step 2: Extract if archive
-    if any(filepath.lower().endswith(ext) for ext in config['archive_extensions']):
+    depth = _extraction_depth.get()
+    is_archive = lower_name.endswith(ARCHIVE_SUFFIXES)
+    # Archives already extracted before are not extracted again. Only
+    # archives that scanned clean are recorded, so a failed scan (e.g. clamd
+    # down) never lets a later copy skip its extraction unchecked.
+    digest = seen = None
+    if processed_cache is not None and is_archive and scan_result == "clean" and depth < MAX_EXTRACTION_DEPTH:
+        digest = file_hash(filepath, HASH_ALGO, ctx.stat)
+        seen = processed_cache.get(digest, ctx.stat.st_size, HASH_ALGO)
+    if is_archive and depth >= MAX_EXTRACTION_DEPTH:
+        logger.warning(f"Archive nested too deeply, organizing without extracting: {filepath}")
+    elif is_archive and seen is not None:
+        logger.info(f"Archive already extracted (cache hit), skipping: {filepath}")
+        return
+    elif is_archive:
         logger.info(f"Identified as archive file: {filepath}")
+        extract_to = make_extract_dir()
+        depth_token = _extraction_depth.set(depth + 1)
         try:
-            extracted_files = extract_archives(filepath, config)
-            logger.info(f"Extracted {len(extracted_files)} files from archive: {filepath}")
-            for extracted in extracted_files:
-                logger.debug(f"Processing extracted file: {extracted}")
-                process_new_file(extracted)
+            if clamd_configured(config) and lower_name.endswith(STREAMABLE_EXTENSIONS):
+                # Members are scanned by clamd while they are being written
+                extracted_files, failed = extract_and_scan_stream(filepath, config, extract_to)
+            else:
+                extracted_files = extract_archives(filepath, config, extract_to)
+                logger.info(f"Extracted {len(extracted_files)} files from archive: {filepath}")
+                # Scan all members concurrently before organizing any of them
+                scan_results = scan_files(extracted_files, config)
+                failed = [f for f in extracted_files if scan_results[f] == "error"]
+                extracted_files = [f for f in extracted_files if scan_results[f] == "clean"]
+            extracted_files += _rescan_failed(failed)
+            # Members are independent: organize them in parallel. The pool is
+            # per archive so a nested archive never waits on its parent's workers.
+            workers = max(1, min(MEMBER_WORKERS, len(extracted_files)))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="member") as pool:
+                futures = {}
+                for extracted in extracted_files:
+                    logger.debug("Processing extracted file: %s", extracted)
+                    future = pool.submit(contextvars.copy_context().run, process_new_file, extracted, scanned=True)
+                    futures[future] = extracted
+                members_ok = _wait_for(futures)
+            # An archive whose members did not all go through is extracted again next time
+            if members_ok:
+                _remember_processed(digest, ctx, filepath)
         except Exception as e:
             logger.error(f"Error extracting archive {filepath}: {e}")
+        finally:
+            _extraction_depth.reset(depth_token)
+            shutil.rmtree(extract_to, ignore_errors=True)
         return
 
     # Step 3: Organize and deduplicate
-    logger.debug(f"Starting file organization for: {filepath}")
+    logger.debug("Starting file organization for: %s", filepath)
     try:
-        organized_path = organize_file(filepath, config)
+        organized_path = organize_file(filepath, config, ctx)
     except Exception as e:
         logger.error(f"Error organizing file {filepath}: {e}")
         return
+    if organized_path is None:
+        return
 
     # Step 4: Metadata extraction
-    logger.debug(f"Starting metadata extraction for: {organized_path}")
+    logger.debug("Starting metadata extraction for: %s", organized_path)
     try:
         extract_metadata(organized_path, config)
         logger.info(f"Successfully completed processing: {os.path.basename(filepath)} -> {organized_path}")
     except Exception as e:
         logger.error(f"Error extracting metadata from {organized_path}: {e}")
 
+def _rescan_failed(paths):
+    """Scan members whose batch or streaming scan failed again with scan_file.
+
+    Quarantined members are dropped. A member whose scan fails again is
+    kept, as a top-level file with a failed scan would be.
+    """
+    kept = []
+    for path in paths:
+        result = scan_file(path, config)
+        if result == "quarantined":
+            logger.warning(f"Archive member {path} quarantined by antivirus.")
+            continue
+        if result == "error":
+            logger.warning(f"Archive member could not be scanned: {path}")
+        kept.append(path)
+    return kept
+
+def _remember_processed(digest, ctx, result):
+    if digest is not None:
+        processed_cache.put(digest, ctx.stat.st_size, HASH_ALGO, result)
+
+def _existing_file_chunks(watch_dir):
+    """Yield the watch directory's files as sorted lists of (path, stat).
+
+    Entries are read lazily and handed out EXISTING_FILES_CHUNK at a time,
+    so a huge directory is never held in memory as a whole. scandir
+    reports the entry type with the listing; each file's stat is taken
+    here once and passed on to process_new_file.
+    """
+    chunk = []
+    with os.scandir(watch_dir) as it:
+        for entry in it:
+            if entry.is_file():
+                with contextlib.suppress(FileNotFoundError):  # removed since listing
+                    chunk.append((entry.path, entry.stat()))
+            if len(chunk) >= EXISTING_FILES_CHUNK:
+                yield sorted(chunk)
+                chunk = []
+    if chunk:
+        yield sorted(chunk)
+
+def _wait_for(futures):
+    """Wait for {future: path} and log any that raised; True if none did."""
+    ok = True
+    for future in as_completed(futures):
+        try:
+            future.result()
+        except Exception:
+            # Unexpected here: process_new_file handles its own errors
+            logger.exception(f"Error processing file {futures[future]}")
+            ok = False
+    return ok
+
 def process_existing_files(watch_dir):
     logger.info(f"Scanning for existing files in {watch_dir}...")
-    
-    # Check if watch directory exists
-    if not os.path.exists(watch_dir):
-        logger.error(f"Watch directory does not exist: {watch_dir}")
-        logger.info("Please create the watch directory or update config.yaml")
-        return
-        
+
     try:
-        files = os.listdir(watch_dir)
-        logger.info(f"Found {len(files)} items in watch directory")
-        
+        # Files are independent and mostly wait on clamd, disk and OCR, so
+        # a thread pool overlaps them without forking the whole process.
+        # The next chunk is listed while the previous one is processed.
         file_count = 0
-        for fname in files:
-            fpath = os.path.join(watch_dir, fname)
-            if os.path.isfile(fpath):
-                file_count += 1
-                logger.debug(f"Processing existing file: {fname}")
-                process_new_file(fpath)
-                
+        pending = {}
+        with ThreadPoolExecutor(max_workers=config.get('monitor_workers'),
+                                thread_name_prefix="existing") as pool:
+            for chunk in _existing_file_chunks(watch_dir):
+                logger.debug("Queued %s existing files", len(chunk))
+                submitted = {pool.submit(process_new_file, fpath, st=st): fpath for fpath, st in chunk}
+                _wait_for(pending)
+                pending = submitted
+                file_count += len(chunk)
+            _wait_for(pending)
+
         logger.info(f"Processed {file_count} existing files")
-        
+
+    except FileNotFoundError:
+        # Reported by scandir itself rather than checked with exists() first
+        logger.error(f"Watch directory does not exist: {watch_dir}")
+        logger.info("Please create the watch directory or update config.yaml")
     except PermissionError:
         logger.error(f"Permission denied accessing watch directory: {watch_dir}")
     except Exception as e:
@@ -104,8 +246,24 @@ def process_existing_files(watch_dir):
 def main():
     logger.info("SecureDownloads Orchestrator started.")
     process_existing_files(config['directories']['watch'])
-    monitor = FolderMonitor(config['directories']['watch'], process_new_file)
-    monitor.start()
+    monitor = FolderMonitor(config['directories']['watch'], process_new_file,
+                            max_workers=config.get('monitor_workers'),
+                            ignore_patterns=[f"*{ext}" for ext in IGNORE_EXTENSIONS],
+                            use_close_events=config.get('use_close_events', False))
+    try:
+        monitor.start()
+    finally:
+        shutdown()
+
+def shutdown():
+    """Write out any buffered state before the process exits."""
+    flush_metadata()
+    if hash_cache is not None:
+        set_persistent_hash_cache(None)
+        hash_cache.close()
+    if processed_cache is not None:
+        processed_cache.close()
+    logger.info("SecureDownloads Orchestrator stopped.")
 
 if __name__ == "__main__":
     main()
@@ -4,12 +4,20 @@ Tests for SecureDownloadsOrchestrator security and quality fixes.
 Tests the critical security improvements and behavioral changes.
 """
 
+import errno
+import io
 import os
+import socket
+import struct
+import subprocess
 import sys
 import tempfile
 import shutil
-import yaml
+import threading
+import time
 import unittest
+import zipfile
+from collections import OrderedDict
 from unittest.mock import patch, MagicMock
 
 # Add modules path for testing
@@ -17,17 +25,38 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 from modules.organize import is_keyword_match_file, organize_file
 from modules.extract import extract_archives
+from modules.config_loader import load_config
 
 
-class TestSecurityFixes(unittest.TestCase):
+class TempRootTestCase(unittest.TestCase):
+    """Base class giving each test its own directories under one temporary root per class."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Create one temporary root shared by every test in the class."""
+        cls.temp_root = tempfile.mkdtemp(prefix='test_security_fixes_')
+
+    @classmethod
+    def tearDownClass(cls):
+        """Remove the shared temporary root."""
+        shutil.rmtree(cls.temp_root, ignore_errors=True)
+
+    def make_dir(self, name):
+        """Create and return a directory private to the running test."""
+        path = os.path.join(self.temp_root, self._testMethodName, name)
+        os.makedirs(path)
+        return path
+
+
+class TestSecurityFixes(TempRootTestCase):
     """Test suite for security and quality improvements."""
-    
+
     def setUp(self):
         """Set up test configuration."""
         self.test_config = {
             'directories': {
-                'organized': tempfile.mkdtemp(prefix='test_organized_'),
-                'quarantine': tempfile.mkdtemp(prefix='test_quarantine_'),
+                'organized': self.make_dir('organized'),
+                'quarantine': self.make_dir('quarantine'),
                 'logs': '/tmp/test.log'
             },
             'content_organization': {
@@ -37,13 +66,6 @@ class TestSecurityFixes(unittest.TestCase):
             }
         }
     
-    def tearDown(self):
-        """Clean up test directories."""
-        for dir_path in [self.test_config['directories']['organized'], 
-                        self.test_config['directories']['quarantine']]:
-            if os.path.exists(dir_path):
-                shutil.rmtree(dir_path)
-    
     def test_content_organization_generalization(self):
         """Test that content organization is now configurable and generalized."""
         # Test Springfield matching (original example)
@@ -75,22 +97,131 @@ class TestSecurityFixes(unittest.TestCase):
         """Test that extract_archives uses secure random temp directories."""
         mock_mkdtemp.return_value = '/tmp/secure_test_dir'
         
-        # Mock the file operations to avoid actual extraction
-        with patch('os.path.exists', return_value=False), \
-             patch('os.walk', return_value=[]), \
-             patch('shutil.rmtree'):
-            
+        # The archive does not exist, so extraction fails and the mocked
+        # directory is cleaned up; only rmtree needs patching
+        with patch('modules.extract.shutil.rmtree') as mock_rmtree:
             result = extract_archives('/fake/test.zip', self.test_config)
-            
-            # Verify tempfile.mkdtemp was called with security parameters
-            mock_mkdtemp.assert_called_once_with(prefix="secure_extract_", suffix="_tmp")
+        
+        # Verify tempfile.mkdtemp was called with security parameters
+        mock_mkdtemp.assert_called_once_with(prefix="secure_extract_", suffix="_tmp")
+        mock_rmtree.assert_called_once_with('/tmp/secure_test_dir')
+        self.assertEqual(result, [])
     
+    def test_tar_path_traversal_rejected(self):
+        """Test that tar members escaping the extraction directory are skipped."""
+        import io
+        import tarfile
+        
+        archive_dir = self.make_dir('archive')
+        extract_to = self.make_dir('extract')
+        archive = os.path.join(archive_dir, 'evil.tar')
+        with tarfile.open(archive, 'w') as tf:
+            for name in ['../escaped.txt', '/absolute.txt', 'docs/safe.txt']:
+                info = tarfile.TarInfo(name)
+                info.size = 4
+                tf.addfile(info, io.BytesIO(b'data'))
+
+        result = extract_archives(archive, self.test_config, extract_to)
+
+        self.assertEqual(result, [os.path.join(extract_to, 'docs', 'safe.txt')])
+        self.assertFalse(os.path.exists(os.path.join(os.path.dirname(extract_to), 'escaped.txt')))
+
+    def test_name_collision_is_not_deduplicated(self):
+        """Test that files sharing a name but not content are both kept."""
+        source_dir = self.make_dir('source')
+        results = []
+        for content in (b'first', b'other', b'first'):
+            source = os.path.join(source_dir, 'contract.bin')
+            with open(source, 'wb') as f:
+                f.write(content)
+            results.append(organize_file(source, self.test_config))
+
+        self.assertEqual(os.path.basename(results[0]), 'contract.bin')
+        self.assertNotEqual(results[0], results[1])
+        self.assertEqual(results[0], results[2])
+        self.assertEqual(len(os.listdir(os.path.dirname(results[0]))), 2)
+
+    def test_hash_prefix_clash_is_not_deduplicated(self):
+        """Test that a different file already at the hash-prefixed name is kept."""
+        from modules.organize import file_hash
+        source = os.path.join(self.make_dir('source'), 'contract.bin')
+        with open(source, 'wb') as f:
+            f.write(b'incoming')
+        dest_dir = os.path.join(self.test_config['directories']['organized'], 'Business')
+        os.makedirs(dest_dir)
+        prefix = file_hash(source)[:8]
+        for name in ('contract.bin', f'{prefix}_contract.bin'):
+            with open(os.path.join(dest_dir, name), 'wb') as f:
+                f.write(b'unrelated')
+
+        result = organize_file(source, self.test_config)
+
+        with open(result, 'rb') as f:
+            self.assertEqual(f.read(), b'incoming')
+        self.assertEqual(len(os.listdir(dest_dir)), 3)
+
+    def test_legacy_prefixed_copy_is_deduplicated(self):
+        """Test that a file organized under the old {hash8}_{name} scheme still counts as a duplicate."""
+        from modules.organize import file_hash
+        dest_dir = os.path.join(self.test_config['directories']['organized'], 'Business')
+        os.makedirs(dest_dir)
+        source_dir = self.make_dir('source')
+        results = []
+        for content in (b'organized before', b'other'):
+            source = os.path.join(source_dir, 'contract.bin')
+            with open(source, 'wb') as f:
+                f.write(content)
+            if not results:
+                legacy = os.path.join(dest_dir, f'{file_hash(source)[:8]}_contract.bin')
+                shutil.copyfile(source, legacy)
+            results.append(organize_file(source, self.test_config))
+
+        self.assertEqual(results, [legacy, os.path.join(dest_dir, 'contract.bin')])
+        self.assertFalse(os.path.exists(source))
+        self.assertEqual(len(os.listdir(dest_dir)), 2)
+
+    def test_move_never_replaces_existing_destination(self):
+        """Test that _fast_move refuses a taken name, on the link and the copy path."""
+        from modules import organize
+        work_dir = self.make_dir('work')
+        src = os.path.join(work_dir, 'src')
+        dst = os.path.join(work_dir, 'dst')
+        with open(dst, 'wb') as f:
+            f.write(b'existing')
+        pair = (os.stat(work_dir).st_dev, 'cross-device')
+        for move_pair in (None, pair):
+            with open(src, 'wb') as f:
+                f.write(b'incoming')
+            with patch.object(organize, '_CROSS_DEVICE_MOVES', {pair}):
+                with self.assertRaises(FileExistsError):
+                    organize._fast_move(src, dst, move_pair)
+            with open(dst, 'rb') as f:
+                self.assertEqual(f.read(), b'existing')
+            self.assertTrue(os.path.exists(src))
+
+    def test_sender_and_date_match_baseline_parser(self):
+        """Test sender/date extraction against the original separate email and date searches."""
+        from modules.organize import extract_sender_and_date
+        # (text, output of the original parser)
+        cases = [
+            ('2024-01-15.bob@x.com', ('2024-01-15.bob@x.com', '2024-01-15')),
+            ('2023-06-05bob@corp.org', ('2023-06-05bob@corp.org', '2023-06-05')),
+            ('From: alice@example.com Date: 2024-03-05', ('alice@example.com', '2024-03-05')),
+            ('Sent 05/06/2023 by bob@corp.org', ('bob@corp.org', '2023-06-05')),
+            ('bob@x.com 2024 01 15', ('bob@x.com', '2024-01-15')),
+            ('date 31.12.1999 only', ('UnknownSender', '1999-12-31')),
+            ('invalid 2024-02-31 then 2024-03-01', ('UnknownSender', 'UnknownDate')),
+            ('no data here', ('UnknownSender', 'UnknownDate')),
+        ]
+        for text, expected in cases:
+            with self.subTest(text=text):
+                self.assertEqual(extract_sender_and_date(text), expected)
+
     def test_config_validation(self):
         """Test that the new configuration format is valid and accessible."""
         # Test default config loading
         config_path = os.path.join(os.path.dirname(__file__), '..', 'config.yaml')
-        with open(config_path) as f:
-            config = yaml.safe_load(f)
+        config = load_config(config_path)
         
         # Verify content_organization section exists
         self.assertIn('content_organization', config)
@@ -131,19 +262,471 @@ class TestBinaryHandling(unittest.TestCase):
         """Test that file hashing properly handles binary content."""
         from modules.organize import file_hash
         
-        # Create a test binary file
-        with tempfile.NamedTemporaryFile(mode='wb', delete=False) as f:
+        # Create a test binary file, removed when the with block exits; on
+        # 3.12+ delete_on_close=False lets it be reopened by name on Windows too
+        options = {'delete_on_close': False} if sys.version_info >= (3, 12) else {}
+        with tempfile.NamedTemporaryFile(mode='wb', **options) as f:
             binary_data = b'\x00\x01\x02\xff\xfe\xfd'  # Binary content
             f.write(binary_data)
-            test_file = f.name
-        
-        try:
+            f.flush()
+            
             # Test that hash calculation doesn't fail on binary content
-            hash_result = file_hash(test_file)
+            hash_result = file_hash(f.name)
             self.assertIsInstance(hash_result, str)
             self.assertEqual(len(hash_result), 64)  # SHA256 hex length
-        finally:
-            os.unlink(test_file)
+
+
+class FakeClamd:
+    """Minimal clamd speaking INSTREAM on a unix socket.
+
+    Replies FOUND for data containing b'EICAR' and OK otherwise, and
+    records the chunk sizes of every stream it received.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.streams = []
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.bind(path)
+        self._sock.listen(8)
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def close(self):
+        self._sock.close()
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _handle(self, conn):
+        with conn, conn.makefile('rb') as f:
+            command = b''
+            while (c := f.read(1)) not in (b'\0', b''):
+                command += c
+            if command != b'zINSTREAM':
+                return
+            sizes, data = [], b''
+            while size := struct.unpack('!L', f.read(4))[0]:
+                sizes.append(size)
+                data += f.read(size)
+            self.streams.append(sizes)
+            conn.sendall(b'stream: Eicar FOUND\0' if b'EICAR' in data else b'stream: OK\0')
+
+
+class TestClamdScanning(TempRootTestCase):
+    """Test scanning through clamd against a fake clamd."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.clamd = FakeClamd(os.path.join(cls.temp_root, 'clamd.sock'))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.clamd.close()
+        super().tearDownClass()
+
+    def setUp(self):
+        """Point the scanner at the fake clamd."""
+        self.config = {
+            'directories': {'quarantine': self.make_dir('quarantine')},
+            'virus_scanning': {
+                'clamscan_path': 'echo',
+                'clamd_socket': self.clamd.path,
+                'clamd_timeout': 5,
+            },
+        }
+
+    def _write(self, name, data):
+        path = os.path.join(self.make_dir('source'), name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def test_instream_sends_length_prefixed_chunks(self):
+        """Test that INSTREAM data goes out in CLAMD_CHUNK_SIZE chunks and the reply is returned."""
+        from modules.antivirus import clamd_instream, CLAMD_CHUNK_SIZE
+        data = io.BytesIO(b'x' * (2 * CLAMD_CHUNK_SIZE + 5))
+
+        reply = clamd_instream(data, self.config)
+
+        self.assertEqual(reply, 'stream: OK')
+        self.assertEqual(self.clamd.streams[-1], [CLAMD_CHUNK_SIZE, CLAMD_CHUNK_SIZE, 5])
+
+    def test_scan_file_verdicts(self):
+        """Test that scan_file passes clean files and quarantines infected ones."""
+        from modules.antivirus import scan_file
+        clean = self._write('clean.txt', b'hello')
+        evil = os.path.join(os.path.dirname(clean), 'evil.txt')
+        with open(evil, 'wb') as f:
+            f.write(b'EICAR test')
+
+        self.assertEqual(scan_file(clean, self.config), 'clean')
+        self.assertEqual(scan_file(evil, self.config), 'quarantined')
+        self.assertFalse(os.path.exists(evil))
+        self.assertTrue(os.path.exists(os.path.join(self.config['directories']['quarantine'], 'evil.txt')))
+
+    def test_streaming_extract_scans_members(self):
+        """Test that streamed members are split into clean ones and quarantined ones."""
+        from modules.extract import extract_and_scan_stream
+        archive = os.path.join(self.make_dir('archive'), 'bundle.zip')
+        with zipfile.ZipFile(archive, 'w') as zf:
+            zf.writestr('docs/clean.txt', 'hello')
+            zf.writestr('evil.txt', 'EICAR test')
+        extract_to = self.make_dir('extract')
+
+        clean, unscanned = extract_and_scan_stream(archive, self.config, extract_to)
+
+        self.assertEqual(clean, [os.path.join(os.path.realpath(extract_to), 'docs', 'clean.txt')])
+        self.assertEqual(unscanned, [])
+        self.assertTrue(os.path.exists(os.path.join(self.config['directories']['quarantine'], 'evil.txt')))
+
+    def test_streaming_extract_without_clamd_reports_unscanned(self):
+        """Test that members whose scan failed are returned as unscanned, never as clean."""
+        from modules.extract import extract_and_scan_stream
+        self.config['virus_scanning']['clamd_socket'] = os.path.join(self.make_dir('down'), 'clamd.sock')
+        archive = os.path.join(self.make_dir('archive'), 'bundle.zip')
+        with zipfile.ZipFile(archive, 'w') as zf:
+            zf.writestr('a.txt', 'hello')
+            zf.writestr('b.txt', 'EICAR test')
+        extract_to = os.path.realpath(self.make_dir('extract'))
+
+        clean, unscanned = extract_and_scan_stream(archive, self.config, extract_to)
+
+        self.assertEqual(clean, [])
+        self.assertEqual(unscanned, [os.path.join(extract_to, 'a.txt'), os.path.join(extract_to, 'b.txt')])
+        with open(unscanned[1], 'rb') as f:
+            self.assertEqual(f.read(), b'EICAR test')
+
+
+class TestScanCache(TempRootTestCase):
+    """Test the in-memory cache of clean scan verdicts."""
+
+    def setUp(self):
+        """Create a file and count the scans that really run."""
+        from modules import antivirus
+        self.antivirus = antivirus
+        self.path = os.path.join(self.make_dir('watch'), 'download.bin')
+        with open(self.path, 'wb') as f:
+            f.write(b'data')
+        self.config = {'virus_scanning': {}}
+        patcher = patch.object(antivirus, '_scan_file', return_value='clean')
+        self.scan = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_clean_verdict_reused(self):
+        """Test that an unchanged file is scanned once."""
+        for _ in range(2):
+            self.assertEqual(self.antivirus.scan_file(self.path, self.config), 'clean')
+        self.assertEqual(self.scan.call_count, 1)
+
+    def test_clean_verdict_expires(self):
+        """Test that a verdict older than SCAN_CACHE_TTL is not reused."""
+        self.antivirus.scan_file(self.path, self.config)
+        with patch.object(self.antivirus, 'SCAN_CACHE_TTL', 0):
+            self.antivirus.scan_file(self.path, self.config)
+        self.assertEqual(self.scan.call_count, 2)
+
+
+class TestMetadataIndex(TempRootTestCase):
+    """Test the batched metadata index writer."""
+
+    def _organized(self, *names):
+        organized = self.make_dir('organized')
+        for name in names:
+            with open(os.path.join(organized, name), 'w') as f:
+                f.write(name)
+        return organized
+
+    def _read_index(self, organized):
+        import csv
+        with open(os.path.join(organized, 'index.csv'), newline='') as f:
+            return list(csv.reader(f))
+
+    def test_queued_rows_written_on_flush(self):
+        """Test that queued rows reach the index, under one header, once flushed."""
+        from modules.metadata import extract_metadata, flush_metadata, INDEX_FIELDS
+        organized = self._organized('a.txt', 'b.txt')
+        config = {'directories': {'organized': organized}}
+
+        for name in ('a.txt', 'b.txt'):
+            extract_metadata(os.path.join(organized, name), config)
+        flush_metadata()
+
+        rows = self._read_index(organized)
+        self.assertEqual(rows[0], INDEX_FIELDS)
+        self.assertEqual([row[0] for row in rows[1:]], ['a.txt', 'b.txt'])
+
+    def test_queued_rows_written_at_exit(self):
+        """Test that rows still queued when the interpreter exits are flushed by atexit."""
+        organized = self._organized('a.txt')
+        script = (
+            "import sys; sys.path.insert(0, sys.argv[1])\n"
+            "from modules import metadata\n"
+            "metadata.FLUSH_INTERVAL = 60\n"
+            "metadata.extract_metadata(sys.argv[2], {'directories': {'organized': sys.argv[3]}})\n"
+        )
+        repo = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+        subprocess.run([sys.executable, '-c', script, repo, os.path.join(organized, 'a.txt'), organized],
+                       check=True, timeout=30)
+
+        rows = self._read_index(organized)
+        self.assertEqual([row[0] for row in rows[1:]], ['a.txt'])
+
+    def test_reindex_rewrites_in_place(self):
+        """Test that reindex keeps earlier rows, the file mode and no temp files."""
+        from modules.metadata import extract_metadata
+        organized = self._organized('a.txt', 'b.txt')
+        config = {'directories': {'organized': organized}, 'reindex': True}
+
+        extract_metadata(os.path.join(organized, 'a.txt'), config)
+        os.chmod(os.path.join(organized, 'index.csv'), 0o640)
+        extract_metadata(os.path.join(organized, 'b.txt'), config)
+
+        self.assertEqual([row[0] for row in self._read_index(organized)[1:]], ['a.txt', 'b.txt'])
+        self.assertEqual(os.stat(os.path.join(organized, 'index.csv')).st_mode & 0o777, 0o640)
+        self.assertEqual(sorted(os.listdir(organized)), ['a.txt', 'b.txt', 'index.csv'])
+
+
+class TestLoggingSetup(TempRootTestCase):
+    """Test the queue-based logging setup."""
+
+    def test_setup_is_idempotent(self):
+        """Test that a second setup_logging call adds no handler and writes nothing twice."""
+        import atexit
+        import logging
+        from modules import logging_setup
+        root = logging.getLogger()
+        handlers, level = list(root.handlers), root.level
+        log_path = os.path.join(self.make_dir('logs'), 'orchestrator.log')
+
+        with patch('sys.stderr', io.StringIO()):
+            listener = logging_setup.setup_logging(log_path)
+            self.addCleanup(setattr, logging_setup, '_listener', None)
+            self.addCleanup(root.setLevel, level)
+            self.addCleanup(setattr, root, 'handlers', handlers)
+            self.assertIs(logging_setup.setup_logging(log_path), listener)
+            self.assertEqual(len(root.handlers), len(handlers) + 1)
+            logging.getLogger('Orchestrator.Test').warning('logged once')
+            # Stopping drains the queue; the atexit stop is no longer needed
+            listener.stop()
+            atexit.unregister(listener.stop)
+        for handler in listener.handlers:
+            handler.close()
+
+        with open(log_path) as f:
+            self.assertEqual(f.read().count('logged once'), 1)
+
+
+class TestMonitorDebounce(TempRootTestCase):
+    """Test that the monitor turns bursts of events into one callback."""
+
+    def setUp(self):
+        """Create a watched file and a handler with a short quiet period."""
+        from modules.monitor import Handler
+        self.path = os.path.join(self.make_dir('watch'), 'download.bin')
+        with open(self.path, 'wb') as f:
+            f.write(b'data')
+        self.calls = []
+        self.called = threading.Event()
+
+        def callback(filepath, st=None):
+            self.calls.append((filepath, st))
+            self.called.set()
+
+        patcher = patch('modules.monitor.QUIET_PERIOD', 0.05)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.handler = Handler(callback)
+        self.addCleanup(self.handler.cancel_pending)
+
+    def _event(self, kind):
+        from watchdog.events import FileCreatedEvent, FileModifiedEvent
+        event_class = {'created': FileCreatedEvent, 'modified': FileModifiedEvent}[kind]
+        getattr(self.handler, f'on_{kind}')(event_class(self.path))
+
+    def test_burst_dispatched_once(self):
+        """Test that created and modified events for one file give a single callback with its stat."""
+        self._event('created')
+        self._event('modified')
+        self._event('modified')
+
+        self.assertTrue(self.called.wait(5))
+        time.sleep(0.2)
+        self.assertEqual(len(self.calls), 1)
+        filepath, st = self.calls[0]
+        self.assertEqual(filepath, self.path)
+        self.assertEqual(st.st_size, 4)
+
+    def test_repeat_within_debounce_window_ignored(self):
+        """Test that an event soon after a dispatch does not process the file again."""
+        self._event('created')
+        self.assertTrue(self.called.wait(5))
+
+        self._event('modified')
+        time.sleep(0.3)
+        self.assertEqual(len(self.calls), 1)
+
+    def test_cancel_pending_drops_queued_events(self):
+        """Test that events still in their quiet period are dropped on shutdown."""
+        self._event('created')
+        self.handler.cancel_pending()
+
+        time.sleep(0.2)
+        self.assertEqual(self.calls, [])
+
+
+class TestPersistentCaches(TempRootTestCase):
+    """Test the on-disk hash and processed-archive caches."""
+
+    def test_hash_cache_round_trip(self):
+        """Test that digests survive a reopen and are keyed on size and mtime."""
+        from modules.hash_cache import HashCache
+        path = os.path.join(self.make_dir('cache'), 'hashes.db')
+        key = (1, 2, 3, 4, 'sha256')
+        cache = HashCache(path)
+        cache.put(key, 'abc')
+        cache.close()
+
+        cache = HashCache(path)
+        self.addCleanup(cache.close)
+        self.assertEqual(cache.get(key), 'abc')
+        self.assertIsNone(cache.get((1, 2, 3, 5, 'sha256')))
+
+    def test_file_hash_uses_persistent_cache(self):
+        """Test that file_hash reads a digest from the persistent cache instead of the file."""
+        from modules import organize
+        from modules.hash_cache import HashCache
+        work_dir = self.make_dir('work')
+        path = os.path.join(work_dir, 'file.bin')
+        with open(path, 'wb') as f:
+            f.write(b'content')
+        cache = HashCache(os.path.join(work_dir, 'hashes.db'))
+        self.addCleanup(cache.close)
+        organize.set_persistent_hash_cache(cache)
+        self.addCleanup(organize.set_persistent_hash_cache, None)
+        expected = organize.file_hash(path)
+
+        with patch.object(organize, '_hash_cache', OrderedDict()), \
+                patch.object(organize, '_compute_hash') as compute:
+            self.assertEqual(organize.file_hash(path), expected)
+        compute.assert_not_called()
+
+    def test_processed_cache_round_trip(self):
+        """Test that processed archives survive a reopen, keyed on digest, size and algorithm."""
+        from modules.processed_cache import ProcessedCache
+        path = os.path.join(self.make_dir('cache'), 'processed.db')
+        cache = ProcessedCache(path)
+        cache.put('abc', 10, 'sha256', '/watch/bundle.zip')
+        cache.close()
+
+        cache = ProcessedCache(path)
+        self.addCleanup(cache.close)
+        self.assertEqual(cache.get('abc', 10, 'sha256'), '/watch/bundle.zip')
+        self.assertIsNone(cache.get('abc', 11, 'sha256'))
+        self.assertIsNone(cache.get('abc', 10, 'blake3'))
+
+
+class TestSenderDateLimits(unittest.TestCase):
+    """Test the bounds on the sender/date search."""
+
+    def test_search_limited_to_head_of_text(self):
+        """Test that a sender and date past SENDER_DATE_SCAN_CHARS are not found."""
+        from modules.organize import extract_sender_and_date, SENDER_DATE_SCAN_CHARS
+        header = 'bob@corp.org 2023-06-05'
+        inside = ' ' * (SENDER_DATE_SCAN_CHARS - len(header)) + header
+        outside = ' ' * SENDER_DATE_SCAN_CHARS + header
+
+        self.assertEqual(extract_sender_and_date(inside), ('bob@corp.org', '2023-06-05'))
+        self.assertEqual(extract_sender_and_date(outside), ('UnknownSender', 'UnknownDate'))
+
+    def test_long_runs_scanned_in_linear_time(self):
+        """Test that long address-like and digit runs without a match do not backtrack."""
+        from modules.organize import extract_sender_and_date
+        for text in ('a.' * 40000, 'a' * 30000 + '@' + 'b' * 30000, '1' * 60000):
+            with self.subTest(text=text[:8]):
+                start = time.perf_counter()
+                self.assertEqual(extract_sender_and_date(text), ('UnknownSender', 'UnknownDate'))
+                self.assertLess(time.perf_counter() - start, 1.0)
+
+
+class TestKeywordMatching(unittest.TestCase):
+    """Test the regex fallback used when pyahocorasick is not installed."""
+
+    def setUp(self):
+        """Force the regex fallback and start from an empty matcher cache."""
+        from modules import organize
+        patcher = patch.object(organize, 'ahocorasick', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        organize._keyword_matcher.cache_clear()
+        self.addCleanup(organize._keyword_matcher.cache_clear)
+
+    def test_first_group_wins(self):
+        """Test that a name matching several groups goes to the first one configured."""
+        config = {'content_organization': {'Reports': ['report'], 'Yearly': ['annual']}}
+        self.assertEqual(is_keyword_match_file('/x/annual_report.pdf', config), 'Reports')
+
+    def test_keywords_are_literal(self):
+        """Test that regex metacharacters in keywords are matched literally."""
+        config = {'content_organization': {'Code': ['C++'], 'Dotted': ['a.b']}}
+        self.assertEqual(is_keyword_match_file('/x/notes_c++.txt', config), 'Code')
+        self.assertEqual(is_keyword_match_file('/x/a.b.txt', config), 'Dotted')
+        self.assertIsNone(is_keyword_match_file('/x/axb.txt', config))
+
+    def test_edited_keywords_take_effect(self):
+        """Test that changing a config's keywords in place gives a new matcher, within the cache bound."""
+        from modules.organize import _keyword_matcher, KEYWORD_MATCHER_CACHE_SIZE
+        config = {'content_organization': {'Reports': ['report']}}
+        self.assertIsNone(is_keyword_match_file('/x/invoice.pdf', config))
+
+        config['content_organization']['Reports'].append('invoice')
+        self.assertEqual(is_keyword_match_file('/x/invoice.pdf', config), 'Reports')
+        self.assertEqual(_keyword_matcher.cache_info().maxsize, KEYWORD_MATCHER_CACHE_SIZE)
+
+
+class TestCrossDeviceMove(TempRootTestCase):
+    """Test _fast_move's copy path for moves between filesystems."""
+
+    def setUp(self):
+        """Create a source file with a known old mtime."""
+        from modules import organize
+        self.organize = organize
+        work_dir = self.make_dir('work')
+        self.src = os.path.join(work_dir, 'src.bin')
+        self.dst = os.path.join(work_dir, 'dst.bin')
+        with open(self.src, 'wb') as f:
+            f.write(b'payload')
+        os.utime(self.src, ns=(1_000_000_000, 1_000_000_000))
+        self.pair = (os.stat(work_dir).st_dev, 'other-device')
+
+    def _assert_moved(self):
+        with open(self.dst, 'rb') as f:
+            self.assertEqual(f.read(), b'payload')
+        self.assertEqual(os.stat(self.dst).st_mtime_ns, 1_000_000_000)
+        self.assertFalse(os.path.exists(self.src))
+
+    def test_known_cross_device_pair_copies(self):
+        """Test that a pair known to be cross-device is copied without trying a link."""
+        with patch.object(self.organize, '_CROSS_DEVICE_MOVES', {self.pair}), \
+                patch('modules.organize.os.link') as link:
+            self.organize._fast_move(self.src, self.dst, self.pair)
+        link.assert_not_called()
+        self._assert_moved()
+
+    def test_exdev_link_falls_back_to_copy(self):
+        """Test that a link failing with EXDEV records the pair and copies instead."""
+        moves = set()
+        with patch.object(self.organize, '_CROSS_DEVICE_MOVES', moves), \
+                patch('modules.organize.os.link', side_effect=OSError(errno.EXDEV, 'cross-device link')):
+            self.organize._fast_move(self.src, self.dst, self.pair)
+        self.assertEqual(moves, {self.pair})
+        self._assert_moved()
 
 
 if __name__ == '__main__':